@@ -40,6 +40,10 @@ default_prompt = (
     "Return JSON with keys: company_name, emails, phones, addresses, purpose."
 )
 prompt = st.text_area("Extraction Prompt", value=default_prompt, height=120)
+contact_fields = ["company_name", "emails", "phones", "addresses", "purpose"]
+use_rules = st.checkbox(
+    "Find contact details locally (the model only fills what's left)", value=True
+)
 
 if st.button("🚀 Scrape & Analyze"):
     if not url:
@@ -51,19 +55,55 @@ if st.button("🚀 Scrape & Analyze"):
         payload = {
             "url": url,
             "prompt": prompt,
-            "license_key": PAID_LICENSE if st.session_state.is_paid else None
+            "license_key": PAID_LICENSE if st.session_state.is_paid else None,
+            "extractor": "contacts" if use_rules else None,
+            "fields": contact_fields if use_rules else None,
         }
-        with st.spinner("Calling scraping service…"):
-            resp = httpx.post(f"{BACKEND_URL}/scrape", json=payload, timeout=60)
-        
-        response_json = resp.json()
+        # Stream stage events and model tokens as they arrive
+        status = st.empty()
+        output = st.empty()
+        streamed, response_json = "", {}
+        status.info("Fetching page…")
+        with httpx.stream("POST", f"{BACKEND_URL}/scrape/stream", json=payload, timeout=60) as resp:
+            if resp.status_code != 200:
+                resp.read()
+                response_json = {"detail": f"{resp.status_code}: {resp.text}"}
+            event = None
+            for line in resp.iter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    continue
+                if not line.startswith("data: "):
+                    continue
+                data = json.loads(line[len("data: "):])
+                if event == "fetched":
+                    status.info("Page fetched, cleaning…")
+                elif event == "tokens_in":
+                    status.info(f"Asking the model ({data['sent']} tokens of page text)…")
+                elif event == "token":
+                    streamed += data["delta"]
+                    output.code(streamed, language=None)  # a widget here would clash with the final one
+                elif event == "result":
+                    response_json = data
+                elif event == "done":
+                    status.empty()
+                    response_json.setdefault("result", streamed)
+                elif event == "error":
+                    response_json = data
+
         if "result" in response_json:
             data = response_json["result"]
-            if isinstance(data, dict):
-                st.json(data)
+            if isinstance(data, str):
+                try:
+                    data = json.loads(data)
+                except json.JSONDecodeError:
+                    pass
+            if isinstance(data, (dict, list)):
+                output.json(data)
             else:
-                st.text_area("Raw Output", data, height=300)
+                output.text_area("Raw Output", data, height=300)
         else:
+            status.empty()
             st.error(f"Error from backend: {response_json.get('detail', 'Unknown error')}")
 
         if not st.session_state.is_paid:
@@ -0,0 +1,153 @@
+# archive.py (append-only, zstd-compressed snapshots of fetched pages for replay)
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import zstandard
+
+from urls import normalize_url
+
+# ─── CONFIG ───────────────────────────────────────────────
+ARCHIVE_ENABLED = os.getenv("SNAPSHOT_ARCHIVE", "1") == "1"
+ARCHIVE_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+SEGMENT_BYTES = int(float(os.getenv("SNAPSHOT_SEGMENT_MB", 256)) * 1024 * 1024)
+ZSTD_LEVEL = int(os.getenv("SNAPSHOT_ZSTD_LEVEL", 3))
+
+
+@dataclass
+class Snapshot:
+    id: int
+    url: str
+    fetched_at: float
+    tier: str  # tier that originally fetched it
+    status: int | None
+    kind: str  # "html", or "text" when the browser extracted in the page
+    body: str
+
+
+class SnapshotArchive:
+    """Page bodies go into numbered segment files, one zstd frame each, and are
+    never rewritten; a SQLite index maps URL -> (segment, offset, length).
+    Reads slice memory-mapped segments, so replay never touches the network."""
+
+    def __init__(self, root=ARCHIVE_DIR, segment_bytes=SEGMENT_BYTES, level=ZSTD_LEVEL):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.stats = {"writes": 0, "unchanged": 0, "reads": 0, "bytes_in": 0, "bytes_stored": 0}
+        self._lock = threading.Lock()
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._local = threading.local()  # decompressors are not thread-safe
+        self._maps = {}  # segment -> mmap
+        self.db = sqlite3.connect(self.root / "index.sqlite3", check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                url_key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                tier TEXT NOT NULL,
+                status INTEGER,
+                kind TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots (url_key);
+            """
+        )
+        last = self.db.execute("SELECT MAX(segment) FROM snapshots").fetchone()[0]
+        self._segment = last or 1
+        self._file = open(self._path(self._segment), "ab")
+
+    def _path(self, segment: int) -> Path:
+        return self.root / f"segment-{segment:06d}.zst"
+
+    # ─── WRITING ───────────────────────────────────────────
+    def put(self, url: str, body: str, tier: str, status: int | None = None, kind: str = "html") -> int | None:
+        """Appends a snapshot unless the URL's latest one has the same body.
+        Returns the snapshot id, or None when nothing was written."""
+        raw = body.encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        url_key = normalize_url(url)
+        with self._lock:
+            latest = self.db.execute(
+                "SELECT sha256 FROM snapshots WHERE url_key = ? ORDER BY id DESC LIMIT 1",
+                (url_key,),
+            ).fetchone()
+            if latest and latest[0] == digest:
+                self.stats["unchanged"] += 1
+                return None
+            frame = self._compressor.compress(raw)
+            if self._file.tell() and self._file.tell() + len(frame) > self.segment_bytes:
+                self._rotate()
+            offset = self._file.tell()
+            self._file.write(frame)
+            self._file.flush()  # readers map the file, so the bytes must be on disk first
+            snapshot_id = self.db.execute(
+                "INSERT INTO snapshots (url_key, url, fetched_at, tier, status, kind, sha256, segment, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url_key, url, time.time(), tier, status, kind, digest, self._segment, offset, len(frame)),
+            ).lastrowid
+            self.stats["writes"] += 1
+            self.stats["bytes_in"] += len(raw)
+            self.stats["bytes_stored"] += len(frame)
+        return snapshot_id
+
+    def _rotate(self):
+        self._file.close()
+        self._segment += 1
+        self._file = open(self._path(self._segment), "ab")
+
+    # ─── READING ───────────────────────────────────────────
+    def latest(self, url: str) -> Snapshot | None:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT id, url, fetched_at, tier, status, kind, segment, offset, length FROM snapshots "
+                "WHERE url_key = ? ORDER BY id DESC LIMIT 1",
+                (normalize_url(url),),
+            ).fetchone()
+            if row is None:
+                return None
+            *meta, segment, offset, length = row
+            frame = self._view(segment, offset + length)[offset:offset + length]
+            self.stats["reads"] += 1
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return Snapshot(*meta, decompressor.decompress(frame).decode("utf-8"))
+
+    def _view(self, segment: int, end: int) -> mmap.mmap:
+        view = self._maps.get(segment)
+        if view is None or len(view) < end:
+            # The active segment grows; remap it when a record lies past the old end
+            if view is not None:
+                view.close()
+            with open(self._path(segment), "rb") as f:
+                view = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return view
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshots, urls = self.db.execute("SELECT COUNT(*), COUNT(DISTINCT url_key) FROM snapshots").fetchone()
+        return {"snapshots": snapshots, "urls": urls, "segments": self._segment, **self.stats}
+
+    def close(self):
+        with self._lock:
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+            self._file.close()
+            self.db.close()
+
+
+archive = SnapshotArchive() if ARCHIVE_ENABLED else None
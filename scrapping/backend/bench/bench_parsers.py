@@ -0,0 +1,79 @@
+# bench_parsers.py (compare html_text backends on the fixture corpus)
+#
+#   python bench/bench_parsers.py [--repeat 5] [--large-mb 3] [--json]
+#
+# Every fixture is measured as-is and inflated to roughly --large-mb by
+# repeating its <body>, which approximates a big e-commerce listing page.
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from html_text import BACKENDS, available_backends  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def inflate(html: str, target_bytes: int) -> str:
+    head, _, rest = html.partition("<body>")
+    body, _, tail = rest.partition("</body>")
+    copies = max(target_bytes // max(len(body), 1), 1)
+    return f"{head}<body>{body * copies}</body>{tail}"
+
+
+def load_corpus(large_mb: float) -> dict[str, str]:
+    corpus = {}
+    # parsing/ holds parser edge cases the end-to-end bench doesn't serve
+    for path in sorted(FIXTURES.glob("*.html")) + sorted(FIXTURES.glob("parsing/*.html")):
+        html = path.read_text(encoding="utf-8")
+        corpus[path.stem] = html
+        corpus[f"{path.stem}@{large_mb:g}MB"] = inflate(html, int(large_mb * 1024 * 1024))
+    return corpus
+
+
+def measure(fn, html: str, repeat: int) -> tuple[float, str]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = fn(html)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, text
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--large-mb", type=float, default=3)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+
+    backends = available_backends()
+    results = []
+    for name, html in load_corpus(args.large_mb).items():
+        baseline = None
+        for backend in reversed(backends):  # html.parser first, as the reference
+            ms, text = measure(BACKENDS[backend][0], html, args.repeat)
+            words = text.split()
+            baseline = words if baseline is None else baseline
+            results.append({
+                "fixture": name,
+                "bytes": len(html),
+                "backend": backend,
+                "median_ms": round(ms, 2),
+                "same_text": words == baseline,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'fixture':<22}{'bytes':>10}  {'backend':<12}{'median ms':>10}  same text")
+    for r in results:
+        print(f"{r['fixture']:<22}{r['bytes']:>10}  {r['backend']:<12}{r['median_ms']:>10}  {r['same_text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# bench_scrape.py (end-to-end /scrape benchmark against local fixtures and a mock LLM)
+#
+#   python bench/bench_scrape.py [--requests 200] [--concurrency 8] [--mix static,huge,slow]
+#                                [--llm-latency-ms 800] [--out run.json] [--compare baseline.json]
+#
+# Starts fixture_server and mock_llm in-process, then drives the app through
+# an in-process ASGI transport (or a running backend with --backend URL).
+# The report is JSON: throughput plus p50/p95/p99 per stage, taken from the
+# timings_ms every /scrape response carries and from the client-side latency.
+# --compare flags stages whose p95 (or the throughput) moved more than
+# --tolerance against an earlier report and exits 1 on a regression.
+# The spa pages need Chrome; leave them out of --mix where it isn't installed.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import fixture_server  # noqa: E402
+import mock_llm  # noqa: E402
+
+KINDS = ("static", "spa", "huge", "slow")
+PROMPT = "Extract contact details. Return JSON with keys: company_name, emails, phones, addresses."
+# env var -> file under the per-run state directory
+STORE_PATHS = {
+    "JOBS_DB_PATH": "jobs.sqlite3",
+    "LLM_CACHE_PATH": "llm_cache.sqlite3",
+    "HTTP_CACHE_PATH": "http_cache.sqlite3",
+    "SNAPSHOT_DIR": "snapshots",
+    "WATCH_DB_PATH": "watch.sqlite3",
+    "TEMPLATES_DB_PATH": "templates.sqlite3",
+}
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "n": len(samples),
+        "mean": round(sum(samples) / len(samples), 1),
+        "p50": round(percentile(samples, 50), 1),
+        "p95": round(percentile(samples, 95), 1),
+        "p99": round(percentile(samples, 99), 1),
+    }
+
+
+def build_urls(base_url: str, args) -> list[str]:
+    names = sorted(fixture_server.load_fixtures())
+    kinds = args.mix.split(",")
+    params = {"huge": f"mb={args.huge_mb}", "slow": f"delay_ms={args.slow_ms}"}
+    urls = []
+    for i in range(args.requests):
+        kind, name = kinds[i % len(kinds)], names[i // len(kinds) % len(names)]
+        query = "&".join(filter(None, [params.get(kind), f"n={i}"]))
+        urls.append(f"{base_url}/{kind}/{name}?{query}")
+    return urls
+
+
+async def drive(client: httpx.AsyncClient, urls: list[str], concurrency: int) -> dict:
+    stages = defaultdict(list)
+    outcomes = Counter()
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def worker():
+        while not queue.empty():
+            url = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.post("/scrape", json={"url": url, "prompt": PROMPT})
+            except httpx.HTTPError as e:
+                outcomes[type(e).__name__] += 1
+                continue
+            stages["client"].append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                outcomes[f"http_{response.status_code}"] += 1
+                continue
+            body = response.json()
+            if "detail" in body:
+                outcomes["error"] += 1
+                continue
+            outcomes[f"ok_{body['fetch_tier']}"] += 1
+            for stage, ms in body["timings_ms"].items():
+                stages[stage].append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ok = sum(count for outcome, count in outcomes.items() if outcome.startswith("ok_"))
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(ok / elapsed, 2),
+        "outcomes": dict(outcomes),
+        "stages_ms": {stage: summarize(samples) for stage, samples in sorted(stages.items())},
+    }
+
+
+async def run(args, fixtures_url: str) -> dict:
+    if args.backend:
+        async with httpx.AsyncClient(base_url=args.backend, timeout=args.timeout) as client:
+            return await drive(client, build_urls(fixtures_url, args), args.concurrency)
+
+    import main as app_module  # reads the environment set up in main()
+
+    app = app_module.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await drive(client, build_urls(fixtures_url, args), args.concurrency)
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> dict:
+    """Relative change per stage p95 and for throughput; positive is slower."""
+    changes, regressions = {}, []
+    for stage, now in report["stages_ms"].items():
+        before = baseline["stages_ms"].get(stage)
+        if not before or not before["p95"]:
+            continue
+        change = (now["p95"] - before["p95"]) / before["p95"]
+        changes[f"{stage}.p95"] = round(change, 3)
+        if change > tolerance:
+            regressions.append(f"{stage}.p95")
+    if baseline["throughput_rps"]:
+        change = (baseline["throughput_rps"] - report["throughput_rps"]) / baseline["throughput_rps"]
+        changes["throughput"] = round(change, 3)
+        if change > tolerance:
+            regressions.append("throughput")
+    return {"tolerance": tolerance, "changes": changes, "regressions": regressions}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="static,huge,slow", help=f"comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--huge-mb", type=float, default=3)
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=0)
+    parser.add_argument("--backend", help="benchmark a running backend instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--out", help="also write the report to this file")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    if unknown := set(args.mix.split(",")) - set(KINDS):
+        parser.error(f"unknown page kinds: {', '.join(sorted(unknown))}")
+
+    _, fixtures_url = fixture_server.start()
+    _, llm_url = mock_llm.start(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+    if not args.backend:
+        os.environ["OPENAI_BASE_URL"] = llm_url
+        os.environ.setdefault("OPENAI_API_KEY", "bench")
+        # Every request should pay for its own completion
+        os.environ.setdefault("LLM_CACHE", "0")
+        # Nothing carries over between runs: no replayed or revalidated pages,
+        # and every store starts empty in a directory removed afterwards
+        os.environ.setdefault("SNAPSHOT_ARCHIVE", "0")
+        os.environ.setdefault("HTTP_CACHE", "0")
+        # template induction adds its own completions to the LLM numbers
+        os.environ.setdefault("SELECTOR_TEMPLATES", "0")
+        # every fixture is on 127.0.0.1, so per-domain spacing would cap the run
+        os.environ.setdefault("POLITENESS", "0")
+        state = tempfile.TemporaryDirectory(prefix="bench-state-")
+        for var, name in STORE_PATHS.items():
+            os.environ.setdefault(var, os.path.join(state.name, name))
+        if "spa" not in args.mix:
+            os.environ.setdefault("DRIVER_POOL_SIZE", "0")
+
+    report = {
+        "config": {
+            **{k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+            "python": platform.python_version(),
+        },
+        **asyncio.run(run(args, fixtures_url)),
+    }
+    if args.compare:
+        report["comparison"] = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        Path(args.out).write_text(output)
+    if report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
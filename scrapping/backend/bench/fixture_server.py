@@ -0,0 +1,106 @@
+# fixture_server.py (local web server serving the fixture corpus in several shapes)
+#
+#   python bench/fixture_server.py [--port 8765]
+#
+#   /static/<name>                 the fixture as-is
+#   /spa/<name>                    empty app shell; the body arrives via fetch()
+#   /huge/<name>?mb=3              body repeated to roughly mb megabytes
+#   /slow/<name>?delay_ms=2000     body trickled out over delay_ms
+#
+# Any other query parameter is ignored, so callers can add ?n=<i> to keep
+# otherwise identical URLs from being coalesced or cached.
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench_parsers import FIXTURES, inflate
+
+SLOW_CHUNKS = 10
+
+SPA_SHELL = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{name}</title></head>
+<body><div id="root"></div>
+<script>
+setTimeout(function () {{
+  fetch("/data/{name}").then(function (r) {{ return r.text(); }}).then(function (html) {{
+    document.getElementById("root").innerHTML = html;
+  }});
+}}, 100);
+</script>
+</body></html>"""
+
+
+def load_fixtures() -> dict[str, str]:
+    return {path.stem: path.read_text(encoding="utf-8") for path in sorted(FIXTURES.glob("*.html"))}
+
+
+def body_of(html: str) -> str:
+    return html.partition("<body>")[2].partition("</body>")[0]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fixtures: dict[str, str] = {}
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        kind, _, name = parts.path.strip("/").partition("/")
+        html = self.fixtures.get(name)
+        if html is None:
+            return self.send(404, "not found", "text/plain")
+        if kind == "static":
+            return self.send(200, html)
+        if kind == "spa":
+            return self.send(200, SPA_SHELL.format(name=name))
+        if kind == "data":
+            return self.send(200, body_of(html))
+        if kind == "huge":
+            return self.send(200, inflate(html, int(float(query.get("mb", 3)) * 1024 * 1024)))
+        if kind == "slow":
+            return self.send(200, html, delay=float(query.get("delay_ms", 2000)) / 1000)
+        self.send(404, "not found", "text/plain")
+
+    def send(self, status: int, text: str, content_type: str = "text/html", delay: float = 0):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        step = -(-len(data) // SLOW_CHUNKS) if delay else len(data)
+        for i in range(0, len(data), step):
+            if delay:
+                time.sleep(delay / SLOW_CHUNKS)
+            self.wfile.write(data[i:i + step])
+            self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """Serves in a daemon thread; returns the server and its base URL."""
+    FixtureHandler.fixtures = load_fixtures()
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server, base_url = start(args.port)
+    print(json.dumps({"base_url": base_url, "fixtures": sorted(FixtureHandler.fixtures)}))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
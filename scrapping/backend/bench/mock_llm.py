@@ -0,0 +1,112 @@
+# mock_llm.py (OpenAI-compatible chat completions endpoint with fixed latency)
+#
+#   python bench/mock_llm.py [--port 8766] [--latency-ms 800] [--jitter-ms 0] [--chunk-ms 20]
+#
+# Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8766/v1.
+# The answer is deterministic JSON built from the prompt text, so repeated
+# runs do the same work downstream.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+STREAM_CHUNK_CHARS = 8
+
+
+def answer(messages: list[dict]) -> str:
+    text = messages[-1]["content"] if messages else ""
+    return json.dumps({"emails": sorted(set(EMAIL.findall(text))), "chars": len(text)})
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.8
+    jitter = 0.0
+    chunk_delay = 0.02
+    rng = random.Random(0)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0))
+        content = answer(body.get("messages", []))
+        if body.get("stream"):
+            self.stream(body["model"], content)
+        else:
+            self.reply(body["model"], content)
+
+    def reply(self, model: str, content: str):
+        data = json.dumps({
+            "id": "mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def stream(self, model: str, content: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(content), STREAM_CHUNK_CHARS):
+            event = {
+                "id": "mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + STREAM_CHUNK_CHARS]}, "finish_reason": None}],
+            }
+            self.write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+            time.sleep(self.chunk_delay)
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def start(port: int = 0, latency_ms: float = 800, jitter_ms: float = 0, chunk_ms: float = 20):
+    """Serves in a daemon thread; returns the server and its /v1 base URL."""
+    MockLLMHandler.latency = latency_ms / 1000
+    MockLLMHandler.jitter = jitter_ms / 1000
+    MockLLMHandler.chunk_delay = chunk_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--chunk-ms", type=float, default=20, help="delay between streamed chunks")
+    args = parser.parse_args()
+    server, base_url = start(args.port, args.latency_ms, args.jitter_ms, args.chunk_ms)
+    print(json.dumps({"base_url": base_url}))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
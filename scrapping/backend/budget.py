@@ -0,0 +1,75 @@
+# budget.py (fit page text into a per-model token budget)
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # falls back to a ~4 chars/token estimate
+    tiktoken = None
+
+# ─── CONFIG ───────────────────────────────────────────────
+DEFAULT_TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET", 3000))
+# e.g. {"gpt-4o-mini": 12000, "gpt-3.5-turbo": 6000}
+MODEL_TOKEN_BUDGETS = json.loads(os.getenv("TOKEN_BUDGETS", "{}"))
+
+CHARS_PER_TOKEN = 4
+
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\s*\n\s*")
+
+
+@dataclass
+class Budgeted:
+    text: str
+    tokens_sent: int
+    tokens_dropped: int
+    budget: int
+
+
+def normalize_whitespace(text: str) -> str:
+    # get_text(separator=" ") leaves long runs of spaces and blank lines
+    return _BLANK_LINES.sub("\n", _SPACES.sub(" ", text)).strip()
+
+
+def budget_for(model: str) -> int:
+    return int(MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET))
+
+
+@lru_cache(maxsize=None)
+def encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # BPE files are downloaded on first use; estimate rather than fail offline
+        print(f"Tokenizer unavailable for {model}, estimating: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = encoding_for(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text))
+
+
+def fit_to_budget(text: str, model: str, budget: int | None = None) -> Budgeted:
+    budget = budget_for(model) if budget is None else budget
+    text = normalize_whitespace(text)
+    encoding = encoding_for(model)
+    if encoding is None:
+        total = count_tokens(text, model)
+        kept = text[: budget * CHARS_PER_TOKEN]
+        sent = count_tokens(kept, model)
+        return Budgeted(kept, sent, total - sent, budget)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= budget:
+        return Budgeted(text, len(tokens), 0, budget)
+    return Budgeted(encoding.decode(tokens[:budget]), budget, len(tokens) - budget, budget)
@@ -0,0 +1,78 @@
+# concurrency.py (keeps blocking Selenium / LLM work off the event loop)
+import asyncio
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import HTTPException
+
+# ─── CONFIG ───────────────────────────────────────────────
+MAX_CONCURRENCY = int(os.getenv("SCRAPE_MAX_CONCURRENCY", 4))
+MAX_QUEUE = int(os.getenv("SCRAPE_MAX_QUEUE", 16))
+QUEUE_TIMEOUT = float(os.getenv("SCRAPE_QUEUE_TIMEOUT", 30))
+RETRY_AFTER = int(os.getenv("SCRAPE_RETRY_AFTER", 5))
+# pipeline stage workers (batch jobs); the thread pools below are sized from them
+FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", 8))
+CLEAN_WORKERS = int(os.getenv("PIPELINE_CLEAN_WORKERS", 4))
+EXTRACT_WORKERS = int(os.getenv("PIPELINE_EXTRACT_WORKERS", 16))
+# Browser renders can sit in pool.lease() for up to 30s, so they get their own
+# threads and never hold up parsing of pages fetched over plain HTTP
+BROWSER_THREADS = int(os.getenv("SCRAPE_BROWSER_THREADS", FETCH_WORKERS + MAX_CONCURRENCY))
+# parsing, budgeting and the SQLite stores
+WORK_THREADS = int(os.getenv("SCRAPE_WORK_THREADS", CLEAN_WORKERS + MAX_CONCURRENCY))
+
+browser_executor = ThreadPoolExecutor(max_workers=BROWSER_THREADS, thread_name_prefix="browser")
+executor = ThreadPoolExecutor(max_workers=WORK_THREADS, thread_name_prefix="scrape")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+
+
+async def run_browser(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(browser_executor, partial(fn, *args, **kwargs))
+
+
+def overloaded(detail="Server busy, retry later", retry_after: float = RETRY_AFTER):
+    return HTTPException(
+        status_code=503, detail=detail, headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+class AdmissionLimiter:
+    """Caps running requests and rejects once the wait queue is full."""
+
+    def __init__(self, limit=MAX_CONCURRENCY, max_queue=MAX_QUEUE, timeout=QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0  # running + waiting, updated before any await
+        self._sem = asyncio.Semaphore(limit)
+
+    @property
+    def waiting(self):
+        return max(self.pending - self.limit, 0)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.pending >= self.limit + self.max_queue:
+            raise overloaded()
+        self.pending += 1
+        try:
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise overloaded("Timed out waiting for a free scraper")
+            try:
+                yield
+            finally:
+                self._sem.release()
+        finally:
+            self.pending -= 1
+
+
+limiter = AdmissionLimiter()
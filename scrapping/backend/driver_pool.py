@@ -0,0 +1,185 @@
+# driver_pool.py (warm, reusable undetected-chromedriver instances)
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import undetected_chromedriver as uc
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+from readiness import INSTRUMENT_JS
+
+try:
+    import psutil
+except ImportError:  # RSS based recycling is skipped without psutil
+    psutil = None
+
+# ─── CONFIG ───────────────────────────────────────────────
+POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", 2))
+MAX_PAGES = int(os.getenv("DRIVER_MAX_PAGES", 50))
+MAX_RSS_MB = int(os.getenv("DRIVER_MAX_RSS_MB", 1024))
+LEASE_TIMEOUT = float(os.getenv("DRIVER_LEASE_TIMEOUT", 30))
+
+
+class PoolExhausted(TimeoutError):
+    pass
+
+
+def new_driver():
+    # uc patches and consumes the options object, so build a fresh one each time
+    options = Options()
+    options.headless = True
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    # get() returns at DOMContentLoaded; readiness.wait_until_ready() does the rest
+    options.page_load_strategy = "eager"
+    driver = uc.Chrome(options=options)
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INSTRUMENT_JS})
+    return driver
+
+
+class DriverPool:
+    """Fixed-size pool of pre-launched Chrome drivers handed out via lease()."""
+
+    def __init__(self, size=POOL_SIZE, max_pages=MAX_PAGES, max_rss_mb=MAX_RSS_MB):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    @property
+    def running(self) -> int:
+        """Drivers launched or being launched, leased or not."""
+        return self._created
+
+    @property
+    def idle(self) -> int:
+        return self._idle.qsize()
+
+    # ─── LIFECYCLE ─────────────────────────────────────────
+    def start(self):
+        self._closed = False
+        while self._reserve_slot():
+            try:
+                self._idle.put(self._launch())
+            except Exception as e:
+                # Leave the slot free; lease() retries the launch on demand
+                print(f"Driver warm-up failed: {e}")
+                break
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    # ─── LEASING ───────────────────────────────────────────
+    @contextmanager
+    def lease(self, timeout=LEASE_TIMEOUT):
+        driver = self._acquire(timeout)
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._reserve_slot():
+            return self._launch()
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolExhausted(f"No browser available after {timeout}s")
+
+    def _release(self, driver):
+        driver.pages_served += 1
+        if (
+            self._closed
+            or driver.pages_served >= self.max_pages
+            or self._rss_mb(driver) > self.max_rss_mb
+            or not self._reset(driver)
+        ):
+            self._discard(driver)
+            self._refill()
+            return
+        self._idle.put(driver)
+
+    # ─── HELPERS ───────────────────────────────────────────
+    def _reserve_slot(self):
+        with self._lock:
+            if self._closed or self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _launch(self):
+        # Caller must hold a slot from _reserve_slot()
+        try:
+            driver = new_driver()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        driver.pages_served = 0
+        return driver
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Driver quit failed: {e}")
+        with self._lock:
+            self._created -= 1
+
+    def _refill(self):
+        # Replace a recycled/crashed driver in the background so the pool stays warm
+        def _run():
+            if self._reserve_slot():
+                try:
+                    self._idle.put(self._launch())
+                except Exception as e:
+                    print(f"Driver relaunch failed: {e}")
+
+        threading.Thread(target=_run, daemon=True).start()
+
+    @staticmethod
+    def _reset(driver):
+        # Returns False when the browser is gone so the caller replaces it
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            driver.get("about:blank")
+            return True
+        except WebDriverException as e:
+            print(f"Driver reset failed, replacing: {e}")
+            return False
+
+    @staticmethod
+    def _rss_mb(driver):
+        pid = getattr(driver, "browser_pid", None)
+        if psutil is None or pid is None:
+            return 0
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+            return sum(p.memory_info().rss for p in procs) / (1024 * 1024)
+        except psutil.Error:
+            return 0
+
+
+pool = DriverPool()
@@ -0,0 +1,124 @@
+# extractors.py (rule-based field extractors that run before the LLM)
+import html as html_lib
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from structured import ORGANIZATION_TYPES, json_ld, nodes, opengraph, postal_address, types_of
+
+_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b")
+_NOT_EMAIL_TLD = re.compile(r"\.(png|jpe?g|gif|svg|webp|css|js)$", re.I)
+_PHONE = re.compile(
+    r"(?<![\w+])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{1,4}\)[\s.-]?)?\d{2,4}(?:[\s.-]\d{2,4}){1,4}(?!\w)"
+)
+# a bare digit run in the text only counts as a phone when written like one
+# (+country or (area) prefix) or right after a word that announces one
+_PHONE_CUE = re.compile(r"\b(?:tel(?:ephone)?|phone|ph|call(?: us)?|mobile|cell|fax|whatsapp)\b", re.I)
+PHONE_CUE_CHARS = 25
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# "..., Seattle, WA 98101" style lines; other formats come from schema.org or <address>
+_US_ADDRESS = re.compile(
+    r"\b\d{1,6}\s+[A-Z0-9][\w .'-]{2,60},\s*[A-Z][\w .'-]{1,40},\s*[A-Z]{2}\s+\d{5}(?:-\d{4})?\b"
+)
+_MAILTO = re.compile(r"""href\s*=\s*["']mailto:([^"'?]+)""", re.I)
+_TEL = re.compile(r"""href\s*=\s*["']tel:([^"']+)""", re.I)
+_ADDRESS_TAG = re.compile(r"<address\b[^>]*>(.*?)</address>", re.I | re.S)
+_BREAK = re.compile(r"<br\s*/?>|</p>|</div>", re.I)
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def _dedupe(values, key=lambda v: v.lower()) -> list:
+    seen, out = set(), []
+    for value in values:
+        value = value.strip()
+        if value and key(value) not in seen:
+            seen.add(key(value))
+            out.append(value)
+    return out
+
+
+def _digits(phone: str) -> str:
+    return re.sub(r"\D", "", phone)
+
+
+def _address_tag_lines(html: str) -> list[str]:
+    """One address per <address> element: the street-address line if there is
+    one, otherwise its lines minus emails and phone numbers."""
+    out = []
+    for block in _ADDRESS_TAG.findall(html):
+        text = html_lib.unescape(_TAGS.sub(" ", _BREAK.sub("\n", block)))
+        lines = [" ".join(line.split()) for line in text.splitlines()]
+        street = [m for line in lines for m in _US_ADDRESS.findall(line)]
+        if street:
+            out += street
+            continue
+        lines = [l for l in lines if l and not _EMAIL.search(l) and len(_digits(l)) < 9]
+        if lines:
+            out.append(", ".join(lines))
+    return out
+
+
+def _dedupe_addresses(addresses: list[str]) -> list[str]:
+    # "4 Pike Place, Seattle, WA 98101" and the same line with ", US" are one address
+    kept, keys = [], []
+    for address in addresses:
+        key = " ".join(re.findall(r"\w+", address.lower()))
+        if key and not any(key.startswith(k) or k.startswith(key) for k in keys):
+            kept.append(address.strip())
+            keys.append(key)
+    return kept
+
+
+def extract_contacts(html: str, text: str) -> dict:
+    orgs = [n for n in nodes(json_ld(html or "")) if types_of(n) & ORGANIZATION_TYPES]
+
+    emails = [n["email"] for n in orgs if isinstance(n.get("email"), str)]
+    emails += [html_lib.unescape(m) for m in _MAILTO.findall(html or "")]
+    emails += [m for m in _EMAIL.findall(text) if not _NOT_EMAIL_TLD.search(m)]
+
+    phones = [n["telephone"] for n in orgs if isinstance(n.get("telephone"), str)]
+    phones += [html_lib.unescape(m) for m in _TEL.findall(html or "")]
+    for found in _PHONE.finditer(text):
+        match, digits = found.group(), _digits(found.group())
+        # Short runs are usually prices, years or IDs rather than phone numbers
+        if not 9 <= len(digits) <= 15 or _DATE.match(match):
+            continue
+        # SKUs and order numbers look the same; anything unannounced is left to the LLM
+        cue = text[max(found.start() - PHONE_CUE_CHARS, 0):found.start()]
+        if match.startswith(("+", "(")) or _PHONE_CUE.search(cue):
+            phones.append(match)
+
+    addresses = [a for a in (postal_address(n.get("address")) for n in orgs) if a]
+    addresses += _address_tag_lines(html or "")
+    addresses += _US_ADDRESS.findall(text)
+
+    names = [n["name"] for n in orgs if isinstance(n.get("name"), str) and "Organization" in types_of(n)]
+    names += [n["name"] for n in orgs if isinstance(n.get("name"), str)]
+    if site_name := opengraph(html or "").get("og:site_name"):
+        names.append(site_name)
+
+    return {
+        "company_name": names[0].strip() if names else None,
+        "emails": _dedupe(emails),
+        # the same number written differently is kept once, in its first spelling
+        "phones": _dedupe(phones, key=lambda p: _digits(p)[-10:]),
+        "addresses": _dedupe_addresses(addresses),
+    }
+
+
+@dataclass(frozen=True)
+class Extractor:
+    fields: tuple[str, ...]  # keys this extractor can fill
+    fn: Callable[[str, str], dict]  # (html, text) -> {field: value}
+
+
+EXTRACTORS = {
+    "contacts": Extractor(("company_name", "emails", "phones", "addresses"), extract_contacts),
+}
+
+
+def run_extractor(name: str, html: str, text: str, fields: list[str]) -> tuple[dict, list[str]]:
+    """Returns (values found for the requested fields, fields still missing)."""
+    extractor = EXTRACTORS[name]
+    found = {k: v for k, v in extractor.fn(html, text).items() if k in fields and v}
+    return found, [f for f in fields if f not in found]
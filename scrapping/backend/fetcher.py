@@ -0,0 +1,256 @@
+# fetcher.py (tiered fetch: pooled HTTP first, headless Chrome when needed)
+import os
+import re
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+import httpx
+from selenium.common.exceptions import TimeoutException
+
+from archive import archive
+from concurrency import run_blocking, run_browser
+from driver_pool import pool
+from html_text import BACKEND as TEXT_BACKEND
+from http_cache import CachedPage, http_cache
+from metrics import escalations
+from page_extract import EXTRACT_MODE, extract_in_browser
+from politeness import BACKOFF_STATUSES, politeness, retry_after_seconds
+from readiness import READY_TIMEOUT, wait_until_ready
+from resource_policy import apply_policy, blocked_categories
+from singleflight import SingleFlight
+from urls import domain_of, normalize_url
+
+# ─── CONFIG ───────────────────────────────────────────────
+HTTP_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", 10))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+MIN_TEXT_CHARS = int(os.getenv("HTTP_MIN_TEXT_CHARS", 200))
+DOMAIN_MEMORY_SIZE = int(os.getenv("FETCH_DOMAIN_MEMORY_SIZE", 10000))
+# consecutive HTTP-tier misses before a domain goes straight to the browser,
+# and how long it stays there before the HTTP tier is probed again
+DOMAIN_BROWSER_AFTER = int(os.getenv("FETCH_DOMAIN_BROWSER_AFTER", 2))
+DOMAIN_BROWSER_TTL = float(os.getenv("FETCH_DOMAIN_BROWSER_TTL", 3600))
+USER_AGENT = os.getenv(
+    "HTTP_USER_AGENT",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+)
+
+# Status codes that usually mean a bot wall rather than a real error; of
+# these, BACKOFF_STATUSES mean "slow down": the domain is paused, nothing escalates
+CHALLENGE_STATUSES = {401, 403, 429, 503}
+
+_NOSCRIPT_WALL = re.compile(
+    r"<noscript[^>]*>[^<]*(enable|requires?|turn on)[^<]*javascript", re.I
+)
+_SPA_ROOT = re.compile(
+    r"<(div|main|app-root)[^>]*(id=[\"'](root|app|__next|__nuxt|___gatsby)[\"']|ng-app)[^>]*>\s*</\1>",
+    re.I,
+)
+# Interstitials served by Cloudflare, DataDome and PerimeterX instead of the page
+_CHALLENGE_PAGE = re.compile(
+    r"/cdn-cgi/challenge-platform|cf-chl-|captcha-delivery\.com|px-captcha|"
+    r"<title>\s*(just a moment|attention required|access denied)|verify(ing)? you are (a )?human",
+    re.I,
+)
+_NON_TEXT = re.compile(r"<(script|style|noscript|template)\b.*?</\1>", re.I | re.S)
+_TAGS = re.compile(r"<[^>]+>")
+
+http_client = httpx.AsyncClient(
+    http2=True,
+    follow_redirects=True,
+    timeout=HTTP_TIMEOUT,
+    limits=httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+    ),
+    headers={
+        "User-Agent": USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,*/*;q=0.8",
+    },
+)
+
+# domain -> (consecutive HTTP-tier misses, monotonic time its browser pin runs out)
+domain_tiers: dict[str, tuple[int, float]] = {}
+
+# concurrent requests for the same page share one fetch
+inflight_fetches = SingleFlight()
+
+
+@dataclass
+class FetchResult:
+    url: str
+    html: str
+    tier: str
+    status: int | None = None
+    text: str | None = None  # set when the text is already known (browser extraction, HTTP cache)
+    timings: dict = field(default_factory=dict)  # seconds per sub-step
+    cache: str | None = None  # "fresh" / "revalidated" when served from the HTTP cache
+
+
+def needs_browser(html: str) -> bool:
+    if _NOSCRIPT_WALL.search(html) or _SPA_ROOT.search(html):
+        return True
+    visible = _TAGS.sub(" ", _NON_TEXT.sub(" ", html))
+    return len(" ".join(visible.split())) < MIN_TEXT_CHARS
+
+
+def challenge_page(body: str) -> bool:
+    return bool(_CHALLENGE_PAGE.search(body[:50000]))
+
+
+def polite(url: str):
+    return politeness.slot(url) if politeness else nullcontext()
+
+
+def pushed_back(url: str, reason: str, retry_after: str | None = None):
+    if politeness:
+        politeness.penalize(url, reason, retry_after_seconds(retry_after))
+
+
+def remember(domain: str, tier: str):
+    # One short page or passing interstitial is not enough to give up on
+    # plain HTTP, and a pin only lasts DOMAIN_BROWSER_TTL
+    if tier == "http":
+        domain_tiers.pop(domain, None)
+        return
+    if domain not in domain_tiers and len(domain_tiers) >= DOMAIN_MEMORY_SIZE:
+        domain_tiers.pop(next(iter(domain_tiers)))
+    misses = domain_tiers.get(domain, (0, 0.0))[0] + 1
+    pinned_until = time.monotonic() + DOMAIN_BROWSER_TTL if misses >= DOMAIN_BROWSER_AFTER else 0.0
+    domain_tiers[domain] = (misses, pinned_until)
+
+
+def pinned_to_browser(domain: str) -> bool:
+    return domain_tiers.get(domain, (0, 0.0))[1] > time.monotonic()
+
+
+def browser_fetch(
+    url: str,
+    ready_timeout: float = READY_TIMEOUT,
+    block: list[str] | None = None,
+    extract: str = EXTRACT_MODE,
+) -> FetchResult:
+    timings = {}
+    started = time.perf_counter()
+    with pool.lease() as driver:
+        timings["lease_wait"] = time.perf_counter() - started
+        driver.set_page_load_timeout(ready_timeout)
+        apply_policy(driver, blocked_categories(url, block))
+        started = time.perf_counter()
+        try:
+            driver.get(url)
+        except TimeoutException:
+            print(f"Page load timed out, reading what rendered: {url}")
+        timings["page_load"] = time.perf_counter() - started
+        remaining = max(ready_timeout - timings["page_load"], 0)
+        timings["ready_wait"] = wait_until_ready(driver, remaining)
+        started = time.perf_counter()
+        if extract == "html":
+            result = FetchResult(url, driver.page_source, "browser")
+        else:
+            result = FetchResult(url, "", "browser", text=extract_in_browser(driver, extract))
+        timings["extract"] = time.perf_counter() - started
+        result.timings = timings
+        return result
+
+
+def from_cache(page: CachedPage, how: str) -> FetchResult:
+    text = page.text if page.text_backend == TEXT_BACKEND else None
+    return FetchResult(page.url, page.html, "http", page.status, text, cache=how)
+
+
+async def http_fetch(url: str) -> FetchResult | None:
+    # Returns None when the page has to be rendered in a browser instead
+    # SQLite reads and writes go through the work pool, off the event loop
+    cached = await run_blocking(http_cache.get, url) if http_cache else None
+    if cached and cached.fresh_until > time.time():
+        http_cache.stats["fresh_hits"] += 1
+        return from_cache(cached, "fresh")
+    async with polite(url):
+        response = await http_client.get(url, headers=cached.validators() if cached else None)
+    if response.status_code in BACKOFF_STATUSES:
+        # The site asked us to slow down: fail this fetch (a job item is retried
+        # once the pause is over) rather than send it through Chrome for good
+        pushed_back(url, f"status_{response.status_code}", response.headers.get("retry-after"))
+        response.raise_for_status()
+    elif "html" in response.headers.get("content-type", "") and challenge_page(response.text):
+        pushed_back(url, "challenge_page")
+        escalations.labels(reason="challenge_page").inc()
+        return None
+    elif politeness:
+        politeness.succeeded(url)
+    if cached and response.status_code == 304:
+        await run_blocking(http_cache.refresh, url, response)
+        return from_cache(cached, "revalidated")
+    if response.status_code in CHALLENGE_STATUSES:
+        escalations.labels(reason="challenge_status").inc()
+        return None
+    response.raise_for_status()
+    content_type = response.headers.get("content-type", "")
+    if "html" in content_type and needs_browser(response.text):
+        escalations.labels(reason="needs_js").inc()
+        return None
+    if http_cache and response.status_code == 200:
+        await run_blocking(http_cache.put, url, response)
+    return FetchResult(str(response.url), response.text, "http", response.status_code)
+
+
+def replay(url: str) -> FetchResult:
+    """The latest archived snapshot of url, as if it had just been fetched."""
+    if archive is None:
+        raise LookupError("Snapshot archive is disabled (SNAPSHOT_ARCHIVE=0)")
+    started = time.perf_counter()
+    snapshot = archive.latest(url)
+    if snapshot is None:
+        raise LookupError(f"No archived snapshot for {url}")
+    html, text = (snapshot.body, None) if snapshot.kind == "html" else ("", snapshot.body)
+    return FetchResult(
+        snapshot.url, html, "snapshot", snapshot.status, text,
+        timings={"snapshot_read": time.perf_counter() - started},
+    )
+
+
+async def fetch(
+    url: str,
+    ready_timeout: float = READY_TIMEOUT,
+    block: list[str] | None = None,
+    extract: str = EXTRACT_MODE,
+) -> FetchResult:
+    key = f"{normalize_url(url)}|{ready_timeout}|{block}|{extract}"
+    return await inflight_fetches.do(key, lambda: _fetch(url, ready_timeout, block, extract))
+
+
+async def _fetch(url: str, ready_timeout: float, block: list[str] | None, extract: str) -> FetchResult:
+    result = await _fetch_tiers(url, ready_timeout, block, extract)
+    if archive:
+        started = time.perf_counter()
+        body, kind = (result.html, "html") if result.html else (result.text, "text")
+        await run_blocking(archive.put, url, body, result.tier, result.status, kind)
+        result.timings["archive"] = time.perf_counter() - started
+    return result
+
+
+async def _fetch_tiers(url: str, ready_timeout: float, block: list[str] | None, extract: str) -> FetchResult:
+    domain = domain_of(url)
+    if not pinned_to_browser(domain):
+        try:
+            result = await http_fetch(url)
+        except httpx.TransportError as e:
+            # Network trouble says nothing about the page, so don't remember it
+            print(f"HTTP fetch failed, escalating to browser: {e}")
+            escalations.labels(reason="transport_error").inc()
+        else:
+            if result is not None:
+                remember(domain, "http")
+                return result
+            remember(domain, "browser")
+    else:
+        escalations.labels(reason="domain_memory").inc()
+    async with polite(url):
+        result = await run_browser(browser_fetch, url, ready_timeout, block, extract)
+    if challenge_page(result.html or result.text or ""):
+        pushed_back(url, "challenge_page")
+    elif politeness:
+        politeness.succeeded(url)
+    return result
@@ -0,0 +1,90 @@
+# html_text.py (HTML -> visible text, with pluggable parser backends)
+import os
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional, C-backed
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # optional, C-backed
+    etree = None
+
+# ─── CONFIG ───────────────────────────────────────────────
+# "auto" picks the fastest installed backend
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")
+
+SKIP_TAGS = ("script", "style")
+
+
+def _bs4_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup(SKIP_TAGS):
+        script.decompose()
+    return soup.get_text(separator=" ")
+
+
+def _selectolax_text(html: str) -> str:
+    tree = LexborHTMLParser(html)
+    if tree.root is None:
+        return ""
+    tree.strip_tags(list(SKIP_TAGS))
+    return tree.root.text(separator=" ")
+
+
+def _lxml_text(html: str) -> str:
+    # Comments stay in the tree: removing them while parsing glues the text on
+    # either side together ("a<!-- x -->b" -> "ab"); the walk skips them instead
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    root = etree.HTML(html.encode("utf-8", "replace"), parser=parser)
+    if root is None:
+        return ""
+    # Walk start/end events so text and tails come out in document order
+    # (stripping elements would glue a script's tail onto the text before it)
+    parts = []
+    walker = etree.iterwalk(root, events=("start", "end", "comment", "pi"))
+    for event, el in walker:
+        if event in ("comment", "pi"):
+            if el.tail:
+                parts.append(el.tail)
+        elif event == "start":
+            if el.tag in SKIP_TAGS or el.tag == "template":
+                # the other parsers never expose <template> content as text
+                walker.skip_subtree()
+            elif el.text:
+                parts.append(el.text)
+        elif el.tail:
+            parts.append(el.tail)
+    return " ".join(parts)
+
+
+BACKENDS = {
+    "selectolax": (_selectolax_text, LexborHTMLParser is not None),
+    "lxml": (_lxml_text, etree is not None),
+    "html.parser": (_bs4_text, True),
+}
+
+
+def available_backends() -> list[str]:
+    return [name for name, (_, ok) in BACKENDS.items() if ok]
+
+
+def resolve_backend(name: str = HTML_PARSER) -> str:
+    if name in BACKENDS and BACKENDS[name][1]:
+        return name
+    if name not in ("auto", *BACKENDS):
+        print(f"Unknown HTML_PARSER {name!r}, picking automatically")
+    # Falls back to BeautifulSoup's html.parser, which is always installed
+    return available_backends()[0]
+
+
+BACKEND = resolve_backend()
+
+
+def html_to_text(html: str, backend: str | None = None) -> str:
+    fn, _ = BACKENDS[resolve_backend(backend) if backend else BACKEND]
+    return fn(html)
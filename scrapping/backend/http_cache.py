@@ -0,0 +1,156 @@
+# http_cache.py (conditional-request cache for the plain-HTTP fetch tier)
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from urls import normalize_url
+
+# ─── CONFIG ───────────────────────────────────────────────
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") == "1"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "data/http_cache.sqlite3")
+# entries not fetched or revalidated for this long are dropped
+HTTP_CACHE_RETENTION = float(os.getenv("HTTP_CACHE_RETENTION", 7 * 24 * 3600))
+PURGE_EVERY = 500  # writes between sweeps of old rows
+
+_MAX_AGE = re.compile(r"max-age\s*=\s*(\d+)")
+
+
+def freshness(headers) -> tuple[bool, float]:
+    """(storable, seconds the response may be reused without revalidating)."""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or headers.get("vary", "").strip() == "*":
+        return False, 0
+    if "no-cache" in cache_control:
+        return True, 0
+    if match := _MAX_AGE.search(cache_control):
+        try:
+            age = int(headers.get("age", 0) or 0)
+        except ValueError:
+            age = 0  # a malformed Age is ignored rather than failing the fetch
+        return True, max(int(match.group(1)) - age, 0)
+    if expires := headers.get("expires"):
+        try:
+            return True, max(parsedate_to_datetime(expires).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return True, 0  # an invalid Expires means already expired
+    return True, 0
+
+
+@dataclass
+class CachedPage:
+    url: str  # final URL after redirects
+    status: int
+    html: str
+    etag: str | None
+    last_modified: str | None
+    fresh_until: float
+    text: str | None  # cleaned text, if the clean stage has stored it
+    text_backend: str | None
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """Response bodies with their validators and cleaned text, in SQLite."""
+
+    def __init__(self, path=HTTP_CACHE_PATH, retention=HTTP_CACHE_RETENTION):
+        self.retention = retention
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stored": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "url_key TEXT PRIMARY KEY, url TEXT NOT NULL, status INTEGER NOT NULL, body BLOB NOT NULL, "
+            "sha256 TEXT NOT NULL, etag TEXT, last_modified TEXT, fresh_until REAL NOT NULL, "
+            "text BLOB, text_backend TEXT, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, url: str) -> CachedPage | None:
+        with self._lock:
+            row = self.db.execute(
+                "SELECT url, status, body, etag, last_modified, fresh_until, text, text_backend "
+                "FROM http_cache WHERE url_key = ?",
+                (normalize_url(url),),
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        final_url, status, body, etag, last_modified, fresh_until, text, backend = row
+        return CachedPage(
+            final_url, status, zlib.decompress(body).decode("utf-8"), etag, last_modified,
+            fresh_until, zlib.decompress(text).decode("utf-8") if text else None, backend,
+        )
+
+    def put(self, url: str, response) -> bool:
+        """Stores a 200 response when its validators or freshness make it reusable."""
+        storable, max_age = freshness(response.headers)
+        etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+        url_key = normalize_url(url)
+        if not storable or not (etag or last_modified or max_age):
+            with self._lock:
+                self.db.execute("DELETE FROM http_cache WHERE url_key = ?", (url_key,))
+            return False
+        body = response.text.encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(url_key, url, status, body, sha256, etag, last_modified, fresh_until, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url_key, str(response.url), response.status_code, zlib.compress(body),
+                    hashlib.sha256(body).hexdigest(), etag, last_modified, now + max_age, now,
+                ),
+            )
+            self.stats["stored"] += 1
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.db.execute("DELETE FROM http_cache WHERE updated_at <= ?", (now - self.retention,))
+        return True
+
+    def refresh(self, url: str, response):
+        """A 304 confirms the stored body; take the new freshness and validators."""
+        _, max_age = freshness(response.headers)
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "UPDATE http_cache SET fresh_until = ?, updated_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE url_key = ?",
+                (
+                    now + max_age, now, response.headers.get("etag"),
+                    response.headers.get("last-modified"), normalize_url(url),
+                ),
+            )
+            self.stats["revalidated"] += 1
+
+    def put_text(self, url: str, html: str, text: str, backend: str):
+        # Only attaches to the body it was cleaned from, in case a newer one landed
+        sha = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        with self._lock:
+            self.db.execute(
+                "UPDATE http_cache SET text = ?, text_backend = ? WHERE url_key = ? AND sha256 = ?",
+                (zlib.compress(text.encode("utf-8")), backend, normalize_url(url), sha),
+            )
+
+    def close(self):
+        self.db.close()
+
+
+http_cache = HTTPCache() if HTTP_CACHE_ENABLED else None
@@ -0,0 +1,279 @@
+# jobs.py (batch scraping: durable SQLite queue + background workers)
+import asyncio
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+
+import httpx
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+
+from models import JobRequest, ScrapeOptions, ScrapeRequest
+from politeness import BACKOFF_STATUSES, BackingOff, politeness
+from urls import registrable_domain
+
+# ─── CONFIG ───────────────────────────────────────────────
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.sqlite3")
+# items in flight at once; keep it above the pipeline's total worker count
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 32))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+JOB_MAX_URLS = int(os.getenv("JOB_MAX_URLS", 10000))
+IDLE_POLL = 5.0  # seconds a worker sleeps when the queue looks empty
+
+router = APIRouter()
+
+
+class JobStore:
+    """Jobs and their items in SQLite; every state change is committed at once."""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                options TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                domain TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status);
+            """
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(job_items)")}
+        if "domain" not in columns:
+            # Queues written before per-domain scheduling: fill the column in place
+            self.db.create_function("registrable_domain", 1, registrable_domain, deterministic=True)
+            self.db.execute("ALTER TABLE job_items ADD COLUMN domain TEXT")
+            self.db.execute("UPDATE job_items SET domain = registrable_domain(url)")
+
+    def recover(self) -> int:
+        # Items that were running when the process died go back to the queue;
+        # finished items are never touched again
+        with self._lock:
+            return self.db.execute(
+                "UPDATE job_items SET status = 'pending' WHERE status = 'running'"
+            ).rowcount
+
+    def create(self, urls: list[str], options: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.db.execute("BEGIN")
+            self.db.execute(
+                "INSERT INTO jobs (id, options, created_at) VALUES (?, ?, ?)",
+                (job_id, json.dumps(options), time.time()),
+            )
+            self.db.executemany(
+                "INSERT INTO job_items (job_id, idx, url, domain) VALUES (?, ?, ?, ?)",
+                [(job_id, i, url, registrable_domain(url)) for i, url in enumerate(urls)],
+            )
+            self.db.execute("COMMIT")
+        return job_id
+
+    def claim(self, skip_domains=()):
+        # Oldest pending item whose domain can take a request now; items of
+        # throttled domains stay queued while the rest keep moving
+        skip = ", ".join("?" * len(skip_domains))
+        with self._lock:
+            row = self.db.execute(
+                "UPDATE job_items SET status = 'running', attempts = attempts + 1, updated_at = ? "
+                "WHERE rowid = (SELECT rowid FROM job_items WHERE status = 'pending' "
+                f"AND domain NOT IN ({skip}) ORDER BY rowid LIMIT 1) "
+                "RETURNING job_id, idx, url, attempts",
+                (time.time(), *skip_domains),
+            ).fetchone()
+            if row is None:
+                return None
+            options = self.db.execute("SELECT options FROM jobs WHERE id = ?", (row[0],)).fetchone()
+        return row, json.loads(options[0])
+
+    def finish(self, job_id: str, idx: int, result: dict):
+        with self._lock:
+            self.db.execute(
+                "UPDATE job_items SET status = 'done', result = ?, error = NULL, updated_at = ? "
+                "WHERE job_id = ? AND idx = ?",
+                (json.dumps(result), time.time(), job_id, idx),
+            )
+
+    def fail(self, job_id: str, idx: int, error: str, retry: bool):
+        with self._lock:
+            self.db.execute(
+                "UPDATE job_items SET status = ?, error = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+                ("pending" if retry else "failed", error, time.time(), job_id, idx),
+            )
+
+    def requeue(self, job_id: str, idx: int, error: str):
+        """Puts a running item back without counting the attempt."""
+        with self._lock:
+            self.db.execute(
+                "UPDATE job_items SET status = 'pending', attempts = attempts - 1, error = ?, "
+                "updated_at = ? WHERE job_id = ? AND idx = ?",
+                (error, time.time(), job_id, idx),
+            )
+
+    def progress(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self.db.execute("SELECT created_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = self.db.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall()
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0, **dict(rows)}
+        total = sum(counts.values())
+        finished = counts["done"] + counts["failed"]
+        return {
+            "job_id": job_id,
+            "status": "completed" if finished == total else "running",
+            "total": total,
+            "created_at": job[0],
+            **counts,
+        }
+
+    def results(self, job_id: str, offset: int, limit: int) -> list[dict]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT idx, url, status, result, error FROM job_items "
+                "WHERE job_id = ? AND status IN ('done', 'failed') ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [
+            {
+                "index": idx,
+                "url": url,
+                "status": status,
+                "result": json.loads(result) if result else None,
+                "error": error,
+            }
+            for idx, url, status, result, error in rows
+        ]
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM job_items GROUP BY status").fetchall()
+        return {"pending": 0, "running": 0, "done": 0, "failed": 0, **dict(rows)}
+
+    def close(self):
+        self.db.close()
+
+
+store = None
+workers: list[asyncio.Task] = []
+_wakeup = None
+
+
+def pushed_back(e: Exception) -> bool:
+    """The site asked us to slow down (429/503), or its pause was already on."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code in BACKOFF_STATUSES
+    return isinstance(e, BackingOff)
+
+
+async def _worker(process):
+    while True:
+        _wakeup.clear()
+        claimed = store.claim(politeness.blocked() if politeness else ())
+        if claimed is None:
+            # Also wake when the next throttled domain's pause runs out
+            ready_in = politeness.next_ready_in() if politeness else None
+            try:
+                await asyncio.wait_for(_wakeup.wait(), min(IDLE_POLL, ready_in or IDLE_POLL))
+            except asyncio.TimeoutError:
+                pass
+            continue
+        (job_id, idx, url, attempts), options = claimed
+        try:
+            async with politeness.reserve(url) if politeness else nullcontext():
+                result = await process(ScrapeRequest(url=url, **options))
+        except Exception as e:
+            if politeness and pushed_back(e):
+                # Not the item's fault: it waits in the queue while blocked()
+                # skips the paused domain, and keeps its attempts
+                print(f"Job {job_id} item {idx} deferred: {e}")
+                store.requeue(job_id, idx, str(e))
+            else:
+                print(f"Job {job_id} item {idx} failed: {e}")
+                store.fail(job_id, idx, str(e), retry=attempts < JOB_MAX_ATTEMPTS)
+        else:
+            store.finish(job_id, idx, result)
+
+
+def start_workers(process, count: int = JOB_WORKERS):
+    """process is the coroutine that scrapes one ScrapeRequest and returns a dict."""
+    global store, _wakeup
+    store = JobStore()
+    recovered = store.recover()
+    if recovered:
+        print(f"Re-queued {recovered} job items interrupted by the last shutdown")
+    _wakeup = asyncio.Event()
+    if politeness:
+        politeness.on_ready = _wakeup.set
+    workers.extend(asyncio.create_task(_worker(process)) for _ in range(count))
+
+
+async def stop_workers():
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    workers.clear()
+    if store:
+        store.close()
+
+
+def submit(urls: list[str], options: ScrapeOptions) -> dict:
+    urls = [u.strip() for u in urls if u.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs given")
+    if len(urls) > JOB_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {JOB_MAX_URLS} URLs per job")
+    job_id = store.create(urls, options.model_dump(exclude_none=True))
+    _wakeup.set()
+    return {"job_id": job_id, "total": len(urls)}
+
+
+@router.post("")
+async def create_job(request: JobRequest):
+    return submit(request.urls, ScrapeOptions(**request.model_dump(exclude={"urls"})))
+
+
+@router.post("/upload")
+async def create_job_from_file(file: UploadFile = File(...), prompt: str = Form(...)):
+    # Plain text (one URL per line) or CSV (URL in the first column)
+    content = (await file.read()).decode("utf-8-sig")
+    urls = [row[0] for row in csv.reader(io.StringIO(content)) if row and row[0].startswith("http")]
+    return submit(urls, ScrapeOptions(prompt=prompt))
+
+
+@router.get("/{job_id}")
+async def job_progress(job_id: str):
+    progress = store.progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return progress
+
+
+@router.get("/{job_id}/results")
+async def job_results(job_id: str, offset: int = 0, limit: int = 100):
+    if store.progress(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    limit = max(1, min(limit, 1000))
+    return {"offset": offset, "limit": limit, "items": store.results(job_id, offset, limit)}
@@ -0,0 +1,99 @@
+# llm.py (async OpenAI client over a shared connection pool)
+import asyncio
+import os
+import time
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from concurrency import run_blocking
+from llm_cache import cache, cache_key
+from metrics import stage_seconds
+from singleflight import SingleFlight
+
+# ─── CONFIG ───────────────────────────────────────────────
+MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", 32))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+
+SYSTEM_PROMPT = "You're a web scraping expert."
+
+client = AsyncOpenAI(
+    max_retries=MAX_RETRIES,
+    timeout=httpx.Timeout(TIMEOUT, connect=5.0),
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+    ),
+)
+
+# Process-wide cap on concurrent completions (covers map-reduce fan-out too)
+inflight = asyncio.Semaphore(MAX_INFLIGHT)
+# identical prompts over identical text share one completion
+inflight_completions = SingleFlight()
+
+
+async def complete(messages: list[dict], model: str = MODEL) -> str:
+    key = cache_key(model, messages)
+    if cache:
+        cached = await run_blocking(cache.get, key)
+        if cached is not None:
+            return cached
+    return await inflight_completions.do(key, lambda: _complete(key, messages, model))
+
+
+async def _complete(key: str, messages: list[dict], model: str) -> str:
+    async with inflight:
+        started = time.perf_counter()
+        response = await client.chat.completions.create(model=model, messages=messages)
+        stage_seconds.labels(stage="llm_call").observe(time.perf_counter() - started)
+    content = response.choices[0].message.content
+    if cache and content:
+        await run_blocking(cache.put, key, content)
+    return content
+
+
+async def stream_complete(messages: list[dict], model: str = MODEL):
+    """Yields content deltas as they arrive. A cache hit, or a request identical
+    to one already in flight, is yielded in one piece once it's ready."""
+    key = cache_key(model, messages)
+    if cache:
+        cached = await run_blocking(cache.get, key)
+        if cached is not None:
+            yield cached
+            return
+    if key in inflight_completions:
+        yield await inflight_completions.do(key, lambda: _complete(key, messages, model))
+        return
+    # The stream runs as the shared task, so later duplicates (streaming or
+    # not) join it; this caller reads the deltas it forwards
+    deltas = asyncio.Queue()
+    answer = inflight_completions.task(key, lambda: _stream(key, messages, model, deltas))
+    while (delta := await deltas.get()) is not None:
+        yield delta
+    await asyncio.shield(answer)  # raises if the stream failed
+
+
+async def _stream(key: str, messages: list[dict], model: str, deltas: asyncio.Queue) -> str:
+    parts = []
+    try:
+        async with inflight:
+            started = time.perf_counter()
+            stream = await client.chat.completions.create(model=model, messages=messages, stream=True)
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    deltas.put_nowait(delta)
+            stage_seconds.labels(stage="llm_call").observe(time.perf_counter() - started)
+    finally:
+        deltas.put_nowait(None)
+    content = "".join(parts)
+    if cache and content:
+        await run_blocking(cache.put, key, content)
+    return content
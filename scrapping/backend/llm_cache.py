@@ -0,0 +1,90 @@
+# llm_cache.py (content-addressed cache for LLM answers: memory LRU + SQLite)
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# ─── CONFIG ───────────────────────────────────────────────
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))
+MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", 1024))
+PURGE_EVERY = 500  # writes between sweeps of expired rows
+
+
+def cache_key(model: str, messages: list[dict], **params) -> str:
+    # messages already carry the normalized page text and the prompt
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU in front of a SQLite table; both tiers honour the TTL."""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, memory_size=MEMORY_SIZE):
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.memory = OrderedDict()  # key -> (expires_at, value)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self.memory.pop(key, None)
+            row = self.db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, row[1], row[0])
+            return row[0]
+
+    def put(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                self.db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+
+    def _remember(self, key, expires_at, value):
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        self.db.close()
+
+
+cache = LLMCache() if CACHE_ENABLED else None
@@ -1,21 +1,35 @@
 # main.py (FastAPI backend with new OpenAI client syntax)
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from bs4 import BeautifulSoup
-import undetected_chromedriver as uc
-from selenium.webdriver.chrome.options import Options
-import os
+from fastapi.responses import Response, StreamingResponse
+from contextlib import AsyncExitStack
+import json
 from dotenv import load_dotenv
-from openai import OpenAI  # new import style
-from stripe_payment import router as stripe_router
-
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 
+# Load .env before the local modules below read their config at import time
 load_dotenv()
 
-# Initialize OpenAI client
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")  # just to be safe
-client = OpenAI()
+from stripe_payment import router as stripe_router
+from models import ScrapeRequest
+import jobs
+from driver_pool import pool
+from concurrency import limiter, overloaded
+from fetcher import http_client, inflight_fetches
+from budget import encoding_for
+import llm
+from llm import MODEL
+from llm_cache import cache
+from http_cache import http_cache
+from archive import archive
+from watch import watches
+from templates import templates
+from politeness import BackingOff, politeness
+from metrics import StateCollector, record_error
+from urls import registrable_domain
+from pipeline import (
+    ScrapeContext, clean_stage, extract_stream, fetch_stage, in_ms, pipeline, run_scrape,
+)
 
 app = FastAPI()
 
@@ -28,42 +42,150 @@ app.add_middleware(
 
 # Include stripe routes under /stripe prefix
 app.include_router(stripe_router, prefix="/stripe")
-
-class ScrapeRequest(BaseModel):
-    url: str
-    prompt: str
-    license_key: str | None = None
+app.include_router(jobs.router, prefix="/jobs")
+
+REGISTRY.register(StateCollector(
+    pool, limiter, pipeline, cache,
+    flights={"fetch": inflight_fetches, "llm": llm.inflight_completions},
+    job_counts=lambda: jobs.store.counts() if jobs.store else {},
+    politeness=politeness,
+))
+
+@app.on_event("startup")
+def start_driver_pool():
+    pool.start()
+    encoding_for(MODEL)  # load the tokenizer once, before the first request
+
+@app.on_event("startup")
+async def start_job_workers():
+    # Batch items flow through the queued stages so fetch/parse/LLM overlap
+    pipeline.start()
+    jobs.start_workers(pipeline.submit)
+
+@app.on_event("shutdown")
+async def stop_fetchers():
+    await jobs.stop_workers()
+    await pipeline.stop()
+    if templates:
+        await templates.stop()  # induction calls the LLM and writes the store
+    pool.close()
+    await http_client.aclose()
+    await llm.client.close()
+    if cache:
+        cache.close()
+    if archive:
+        archive.close()
+    if http_cache:
+        http_cache.close()
+    if watches:
+        watches.close()
+    if templates:
+        templates.close()
+
+def refuse_backoff(request: ScrapeRequest):
+    # A domain in backoff gets a 503 up front rather than a slot it can't use
+    if politeness and not request.replay and (left := politeness.backoff_left(request.url)):
+        raise overloaded(f"{registrable_domain(request.url)} asked us to slow down", left)
 
 @app.post("/scrape")
 async def scrape(request: ScrapeRequest):
-    try:
-        options = Options()
-        options.headless = True
-        driver = uc.Chrome(options=options)
-        driver.get(request.url)
-        driver.implicitly_wait(5)
-        html = driver.page_source
-        driver.quit()
-
-        soup = BeautifulSoup(html, "html.parser")
-        for script in soup(["script", "style"]):
-            script.decompose()
-        text = soup.get_text(separator=" ")
-
-        messages = [
-            {"role": "system", "content": "You're a web scraping expert."},
-            {"role": "user", "content": f"{request.prompt}\n\nText:\n{text[:4000]}"},
-        ]
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages
-        )
-
-        return {"result": response.choices[0].message.content}
-    except Exception as e:
-        print(f"Scraping failed: {e}")
-        return {"detail": f"Fetch error: {e}"}
+    refuse_backoff(request)
+    async with limiter.slot():
+        try:
+            return await run_scrape(request)
+        except BackingOff as e:
+            raise overloaded(str(e), e.seconds)
+        except Exception as e:
+            print(f"Scraping failed: {e}")
+            record_error(e)
+            return {"detail": f"Fetch error: {e}"}
+
+class SlotResponse(StreamingResponse):
+    """Frees the admission slot however the response ends, including when the
+    body never starts streaming because the client went away first."""
+
+    def __init__(self, *args, release, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.release()
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/scrape/stream")
+async def scrape_stream(request: ScrapeRequest):
+    # Take the slot before answering so overload is still a plain 503
+    refuse_backoff(request)
+    stack = AsyncExitStack()
+    await stack.enter_async_context(limiter.slot())
+
+    async def events():
+        try:
+            ctx = ScrapeContext(request)
+            await fetch_stage(ctx)
+            yield sse("fetched", {"fetch_tier": ctx.page.tier, "timings_ms": in_ms(ctx.timings)})
+            await clean_stage(ctx)
+            yield sse("cleaned", {"chars": len(ctx.text)})
+            if ctx.structured:
+                yield sse("structured", ctx.structured)
+
+            async for event, data in extract_stream(ctx):
+                yield sse(event, data)
+            response = ctx.response()
+            yield sse("done", {"tokens": response["tokens"], "timings_ms": response["timings_ms"]})
+        except BackingOff as e:
+            # The pause began after the 200 went out
+            yield sse("error", {"detail": str(e), "retry_after": round(e.seconds)})
+        except Exception as e:
+            print(f"Scraping failed: {e}")
+            record_error(e)
+            yield sse("error", {"detail": f"Fetch error: {e}"})
+
+    return SlotResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        release=stack.aclose,
+    )
+
+@app.get("/pipeline/stats")
+def pipeline_stats():
+    return pipeline.stats()
+
+@app.get("/cache/stats")
+def cache_stats():
+    stats = {"enabled": False}
+    if cache is not None:
+        stats = {"enabled": True, "memory_entries": len(cache.memory), **cache.stats}
+    stats["http"] = {"enabled": True, **http_cache.stats} if http_cache else {"enabled": False}
+    return stats
+
+@app.get("/archive/stats")
+def archive_stats():
+    if archive is None:
+        return {"enabled": False}
+    return {"enabled": True, **archive.summary()}
+
+@app.get("/templates")
+def selector_templates():
+    if templates is None:
+        return {"enabled": False}
+    return {"enabled": True, "templates": templates.summary()}
+
+@app.get("/politeness/stats")
+def politeness_stats():
+    if politeness is None:
+        return {"enabled": False}
+    return {"enabled": True, **politeness.summary()}
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+# mapreduce.py (run the prompt over every chunk of a long page, then merge)
+import asyncio
+import json
+import os
+import re
+
+from budget import budget_for, count_tokens, normalize_whitespace
+from ranking import split_chunks
+
+# ─── CONFIG ───────────────────────────────────────────────
+MAP_MAX_CHUNKS = int(os.getenv("MAP_REDUCE_MAX_CHUNKS", 32))
+# All windows of a page go out in one wave by default, so a long page costs
+# about one call's latency; LLM_MAX_INFLIGHT still bounds the process-wide total.
+# Lower it to stop one huge page from taking most of those in-flight slots.
+MAP_PARALLELISM = int(os.getenv("MAP_REDUCE_PARALLELISM", MAP_MAX_CHUNKS))
+
+MAP_SYSTEM_PROMPT = (
+    "You're a web scraping expert. You are given part {part} of {parts} of a web page. "
+    "Extract only what appears in this part. Answer with JSON only; use null or [] "
+    "for anything that is not in this part."
+)
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def pack_chunks(text: str, model: str, budget: int | None = None) -> list[tuple[str, int]]:
+    """Packs consecutive ranking chunks into (text, tokens) windows of at most budget tokens."""
+    budget = budget_for(model) if budget is None else budget
+    windows, current, used = [], [], 0
+    for chunk in split_chunks(normalize_whitespace(text)):
+        size = count_tokens(chunk, model)
+        if current and used + size > budget:
+            windows.append(("\n".join(current), used))
+            current, used = [], 0
+        current.append(chunk)
+        used += size
+    if current:
+        windows.append(("\n".join(current), used))
+    return windows
+
+
+def parse_json(raw: str):
+    try:
+        return json.loads(_FENCE.sub("", raw.strip()))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _dedupe(items: list) -> list:
+    seen, out = set(), []
+    for item in items:
+        key = item.strip().lower() if isinstance(item, str) else json.dumps(item, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            out.append(item)
+    return out
+
+
+def merge_results(parts: list):
+    """Combines partial JSON answers: lists are concatenated and deduped,
+    scalars keep the first non-empty value in page order."""
+    dicts = [p for p in parts if isinstance(p, dict)]
+    if not dicts:
+        lists = [p for p in parts if isinstance(p, list)]
+        return _dedupe([item for p in lists for item in p]) if lists else None
+    merged = {}
+    for part in dicts:
+        for key, value in part.items():
+            if _is_empty(value):
+                merged.setdefault(key, value)
+            elif isinstance(value, list) or isinstance(merged.get(key), list):
+                current = merged.get(key)
+                current = current if isinstance(current, list) else ([] if _is_empty(current) else [current])
+                merged[key] = _dedupe(current + (value if isinstance(value, list) else [value]))
+            elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = merge_results([merged[key], value])
+            elif _is_empty(merged.get(key)):
+                merged[key] = value
+    return merged
+
+
+async def map_reduce(text: str, prompt: str, model: str, complete) -> tuple[object, dict]:
+    """complete is an async callable taking chat messages and returning the reply text."""
+    windows = pack_chunks(text, model)
+    used, skipped = windows[:MAP_MAX_CHUNKS], windows[MAP_MAX_CHUNKS:]
+    semaphore = asyncio.Semaphore(MAP_PARALLELISM)
+
+    async def run(i, window):
+        messages = [
+            {"role": "system", "content": MAP_SYSTEM_PROMPT.format(part=i + 1, parts=len(used))},
+            {"role": "user", "content": f"{prompt}\n\nText:\n{window}"},
+        ]
+        async with semaphore:
+            return await complete(messages)
+
+    raws = await asyncio.gather(*(run(i, window) for i, (window, _) in enumerate(used)))
+    parsed = [parse_json(raw) for raw in raws]
+    merged = merge_results(parsed)
+    if merged is None:  # nothing came back as JSON; hand back the raw parts
+        merged = [raw for raw in raws if raw]
+    stats = {
+        "sent": sum(tokens for _, tokens in used),
+        "dropped": sum(tokens for _, tokens in skipped),
+        "budget": budget_for(model),
+        "chunks": len(used),
+        "unparsed_chunks": sum(p is None for p in parsed),
+    }
+    return merged, stats
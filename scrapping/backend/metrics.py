@@ -0,0 +1,112 @@
+# metrics.py (Prometheus metrics for the scrape pipeline)
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Seconds; spans a warm cache hit up to a slow browser render + LLM call
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+# stage: lease_wait, page_load, ready_wait, extract, fetch, clean, budget,
+# llm, llm_first_token, total (per request) and llm_call (per API call)
+stage_seconds = Histogram(
+    "scraper_stage_seconds", "Time spent per scrape stage", ["stage"], buckets=BUCKETS
+)
+escalations = Counter(
+    "scraper_browser_escalations_total", "Fetches sent to headless Chrome", ["reason"]
+)
+backoffs = Counter(
+    "scraper_domain_backoffs_total", "Times a domain pushed back (429/503, challenge pages)", ["reason"]
+)
+errors = Counter("scraper_errors_total", "Failed scrapes by exception type", ["type"])
+
+
+def observe_stages(timings: dict):
+    for stage, seconds in timings.items():
+        stage_seconds.labels(stage=stage).observe(seconds)
+
+
+def record_error(e: Exception):
+    errors.labels(type=type(e).__name__).inc()
+
+
+class StateCollector:
+    """Reads live state (pool, queues, caches) at scrape time instead of
+    mirroring it into separate gauge objects."""
+
+    def __init__(self, pool, limiter, pipeline, cache, flights, job_counts, politeness=None):
+        self.pool = pool
+        self.limiter = limiter
+        self.pipeline = pipeline
+        self.cache = cache
+        self.flights = flights  # {"fetch": SingleFlight, "llm": SingleFlight}
+        self.job_counts = job_counts  # callable -> {status: count}
+        self.politeness = politeness
+
+    def collect(self):
+        pool = GaugeMetricFamily("scraper_driver_pool", "Chrome driver pool", labels=["state"])
+        pool.add_metric(["size"], self.pool.size)
+        pool.add_metric(["running"], self.pool.running)
+        pool.add_metric(["idle"], self.pool.idle)
+        yield pool
+
+        admission = GaugeMetricFamily(
+            "scraper_admission_requests", "Interactive requests admitted", labels=["state"]
+        )
+        admission.add_metric(["running"], self.limiter.pending - self.limiter.waiting)
+        admission.add_metric(["waiting"], self.limiter.waiting)
+        yield admission
+
+        queued = GaugeMetricFamily(
+            "scraper_pipeline_queue_depth", "Items waiting per pipeline stage", labels=["stage"]
+        )
+        busy = GaugeMetricFamily(
+            "scraper_pipeline_busy_workers", "Busy workers per pipeline stage", labels=["stage"]
+        )
+        processed = CounterMetricFamily(
+            "scraper_pipeline_processed", "Items finished per pipeline stage", labels=["stage"]
+        )
+        for stage in self.pipeline.stages:
+            queued.add_metric([stage.name], stage.inbox.qsize())
+            busy.add_metric([stage.name], stage.busy)
+            processed.add_metric([stage.name], stage.processed)
+        yield queued
+        yield busy
+        yield processed
+
+        jobs = GaugeMetricFamily("scraper_job_items", "Batch job items by status", labels=["status"])
+        for status, count in self.job_counts().items():
+            jobs.add_metric([status], count)
+        yield jobs
+
+        if self.cache is not None:
+            lookups = CounterMetricFamily(
+                "scraper_llm_cache_lookups", "LLM cache lookups", labels=["result"]
+            )
+            for result, count in self.cache.stats.items():
+                lookups.add_metric([result], count)
+            yield lookups
+
+        coalesced = CounterMetricFamily(
+            "scraper_coalesced_requests", "Calls that joined an in-flight duplicate", labels=["layer"]
+        )
+        for layer, flight in self.flights.items():
+            coalesced.add_metric([layer], flight.coalesced)
+        yield coalesced
+
+        if self.politeness is not None:
+            now = time.monotonic()
+            states = self.politeness.domains.values()
+            domains = GaugeMetricFamily(
+                "scraper_politeness_domains", "Domains seen by the politeness scheduler", labels=["state"]
+            )
+            domains.add_metric(["tracked"], len(self.politeness.domains))
+            domains.add_metric(["backing_off"], sum(s.backoff_until > now for s in states))
+            yield domains
+            requests = GaugeMetricFamily(
+                "scraper_politeness_requests", "Fetches held by per-domain limits", labels=["state"]
+            )
+            requests.add_metric(["active"], sum(s.active for s in states))
+            requests.add_metric(["waiting"], sum(s.waiting for s in states))
+            requests.add_metric(["reserved"], sum(s.reserved for s in states))
+            yield requests
@@ -0,0 +1,33 @@
+# models.py (request bodies shared by /scrape and /jobs)
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class ScrapeOptions(BaseModel):
+    prompt: str
+    license_key: str | None = None
+    ready_timeout: float | None = None  # seconds to wait for JS-rendered pages
+    # resource types the browser should not download; None = domain/default policy
+    block_resources: list[Literal["image", "font", "media", "stylesheet", "tracker"]] | None = None
+    # browser tier only: "text"/"tree" extract in the page instead of shipping HTML
+    extract: Literal["html", "text", "tree"] | None = None
+    # "map_reduce" runs the prompt on every chunk in parallel and merges the JSON
+    mode: Literal["single", "map_reduce"] = "single"
+    # rule-based extractor filled in before the LLM, which only gets what it left open
+    extractor: Literal["contacts"] | None = None
+    # JSON keys the answer should have; defaults to the extractor's own fields
+    fields: list[str] | None = None
+    # answer from the latest archived snapshot of the URL instead of fetching it
+    replay: bool = False
+    # compare with the last watched scrape of this URL and prompt: reuse its
+    # result when the page is unchanged, send only the changed sections otherwise
+    watch: bool = False
+
+
+class ScrapeRequest(ScrapeOptions):
+    url: str
+
+
+class JobRequest(ScrapeOptions):
+    urls: list[str]
@@ -0,0 +1,89 @@
+# page_extract.py (pull visible text straight out of the rendered page)
+import os
+
+# "html" ships page_source back for cleaning; "text"/"tree" extract in-browser
+EXTRACT_MODE = os.getenv("BROWSER_EXTRACT_MODE", "html")
+
+# innerText already skips scripts, styles and hidden nodes and follows the
+# rendered layout, so "text" mode is a single native call in the browser.
+TEXT_JS = "return document.body ? document.body.innerText : '';"
+
+# "tree" mode keeps a compact outline: only structural tags survive, every
+# other element is flattened into its parent. Nodes are [tag, ...children].
+TREE_JS = """
+const SKIP = new Set(["script", "style", "noscript", "template", "svg", "canvas", "iframe", "head"]);
+const KEEP = new Set(["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "ul", "ol", "table", "tr",
+                      "td", "th", "a", "address", "header", "footer", "nav", "main", "article",
+                      "section", "dt", "dd", "pre", "blockquote", "label", "button"]);
+function visible(el) {
+  if (el.hidden || el.getAttribute("aria-hidden") === "true") return false;
+  if (el.checkVisibility) return el.checkVisibility({visibilityProperty: true});
+  const cs = getComputedStyle(el);
+  return cs.display !== "none" && cs.visibility !== "hidden";
+}
+function walk(node, out) {
+  if (node.nodeType === 3) {
+    const t = node.nodeValue.replace(/\\s+/g, " ").trim();
+    if (t) out.push(t);
+    return;
+  }
+  if (node.nodeType !== 1) return;
+  const tag = node.tagName.toLowerCase();
+  if (SKIP.has(tag) || !visible(node)) return;
+  const kids = [];
+  for (const child of node.childNodes) walk(child, kids);
+  if (!kids.length) return;
+  if (!KEEP.has(tag)) { out.push(...kids); return; }
+  if (tag === "a" && node.getAttribute("href")) kids.push({href: node.href});
+  out.push([tag, ...kids]);
+}
+const root = [];
+if (document.body) walk(document.body, root);
+return root;
+"""
+
+BLOCK_TAGS = {
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "tr", "td", "th",
+    "dt", "dd", "pre", "blockquote", "address",
+}
+
+
+def tree_to_text(nodes: list, depth: int = 0) -> str:
+    """Renders the browser outline as indented text lines for the LLM."""
+    lines, inline = [], []
+
+    def flush():
+        if inline:
+            lines.append("  " * depth + " ".join(inline))
+            inline.clear()
+
+    for node in nodes:
+        if isinstance(node, str):
+            inline.append(node)
+            continue
+        tag, children = node[0], node[1:]
+        if tag == "a":
+            href = next((c["href"] for c in children if isinstance(c, dict)), "")
+            label = tree_to_text([c for c in children if not isinstance(c, dict)]).replace("\n", " ")
+            inline.append(f"[{label}]({href})" if href.startswith(("mailto:", "tel:")) else label)
+        elif tag in BLOCK_TAGS:
+            flush()
+            prefix = "#" * int(tag[1]) + " " if tag[0] == "h" and tag[1:].isdigit() else ""
+            prefix = "- " if tag == "li" else prefix
+            body = tree_to_text(children, 0).replace("\n", " ")
+            if body:
+                lines.append("  " * depth + prefix + body)
+        else:
+            flush()
+            # only lists indent; other containers would just burn tokens
+            body = tree_to_text(children, depth + (tag in ("ul", "ol")))
+            if body:
+                lines.append(body)
+    flush()
+    return "\n".join(lines)
+
+
+def extract_in_browser(driver, mode: str) -> str:
+    if mode == "tree":
+        return tree_to_text(driver.execute_script(TREE_JS))
+    return " ".join(driver.execute_script(TEXT_JS).split())
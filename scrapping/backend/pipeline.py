@@ -0,0 +1,371 @@
+# pipeline.py (fetch -> clean -> extract stages, run inline or over bounded queues)
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+
+from budget import Budgeted, budget_for, count_tokens, fit_to_budget
+from concurrency import CLEAN_WORKERS, EXTRACT_WORKERS, FETCH_WORKERS, run_blocking
+from extractors import EXTRACTORS, run_extractor
+from fetcher import FetchResult, fetch, replay
+from html_text import BACKEND as TEXT_BACKEND, html_to_text
+from http_cache import http_cache
+from llm import MODEL, SYSTEM_PROMPT, complete, stream_complete
+from mapreduce import map_reduce, parse_json
+from metrics import observe_stages, record_error
+from models import ScrapeRequest
+from page_extract import EXTRACT_MODE
+from ranking import RANK_CHUNKS, select_chunks
+from readiness import READY_TIMEOUT
+from structured import harvest, lookup, preamble
+from templates import template_key, templates
+from watch import WatchCheck, diff_prompt, watches
+
+# ─── CONFIG ───────────────────────────────────────────────
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 8))
+
+
+def build_messages(prompt: str, text: str, structured: str | None = None) -> list[dict]:
+    if structured:
+        prompt = f"{prompt}\n\nStructured data embedded in the page:\n{structured}"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{prompt}\n\nText:\n{text}"},
+    ]
+
+
+def llm_prompt(ctx: "ScrapeContext") -> str:
+    prompt = ctx.request.prompt
+    if ctx.watch and ctx.watch.status == "partial":
+        prompt = diff_prompt(prompt, ctx.watch)
+    if not ctx.missing:
+        return prompt
+    return (
+        f"{prompt}\n\nOnly these keys are still needed; answer with JSON "
+        f"containing exactly: {', '.join(ctx.missing)}."
+    )
+
+
+def needs_llm(ctx: "ScrapeContext") -> bool:
+    if ctx.watch and ctx.watch.status == "unchanged":
+        return False
+    return ctx.missing != []
+
+
+def merge_local(ctx: "ScrapeContext", answer):
+    """Fills the fields the extractor and structured data left open from the LLM answer."""
+    if ctx.local is None:
+        return answer
+    parsed = answer if isinstance(answer, dict) else parse_json(answer)
+    if not isinstance(parsed, dict):
+        print("LLM answer for the remaining fields was not JSON, keeping rule-based fields only")
+        parsed = {}
+    return {**ctx.local, **{f: parsed.get(f) for f in ctx.missing}}
+
+
+def question(request: ScrapeRequest) -> dict:
+    # The options that decide what the answer looks like, for keying stored answers
+    return request.model_dump(include={"prompt", "fields", "extractor", "mode"})
+
+
+def in_ms(timings: dict) -> dict:
+    return {k: round(v * 1000, 1) for k, v in timings.items()}
+
+
+@dataclass
+class ScrapeContext:
+    """Everything one URL accumulates on its way through the stages."""
+
+    request: ScrapeRequest
+    timings: dict = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+    page: FetchResult | None = None
+    text: str | None = None
+    structured: dict | None = None  # JSON-LD / microdata / OpenGraph from the raw HTML
+    preamble: str | None = None  # the same, compacted for the prompt
+    budgeted: Budgeted | None = None
+    tokens: dict | None = None
+    local: dict | None = None  # fields filled by the extractor or structured data
+    missing: list[str] | None = None  # fields left for the LLM
+    watch: WatchCheck | None = None
+    answered_by: str | None = None  # "llm" | "rules" | "template" | "watch"
+    result: object = None
+
+    def response(self) -> dict:
+        self.timings["total"] = time.perf_counter() - self.started
+        observe_stages(self.timings)
+        return {
+            "result": self.result,
+            "fetch_tier": self.page.tier,
+            "http_cache": self.page.cache,
+            "answered_by": self.answered_by,
+            "tokens": self.tokens,
+            "local_fields": list(self.local) if self.local is not None else None,
+            "structured": self.structured or None,
+            "watch": self.watch.summary() if self.watch else None,
+            "timings_ms": in_ms(self.timings),
+        }
+
+
+# ─── STAGES ───────────────────────────────────────────────
+async def fetch_stage(ctx: ScrapeContext):
+    request = ctx.request
+    mark = time.perf_counter()
+    if request.replay:
+        ctx.page = await run_blocking(replay, request.url)
+    else:
+        ctx.page = await fetch(
+            request.url,
+            request.ready_timeout or READY_TIMEOUT,
+            request.block_resources,
+            request.extract or EXTRACT_MODE,
+        )
+    ctx.timings.update(ctx.page.timings)
+    ctx.timings["fetch"] = time.perf_counter() - mark
+
+
+def resolve_fields(request: ScrapeRequest, html: str, text: str, structured: dict, fields: list[str]):
+    """Runs the request's extractor, then structured data, over the requested
+    fields. Returns (found, missing)."""
+    found, missing = {}, list(fields)
+    if request.extractor:
+        found, missing = run_extractor(request.extractor, html, text, missing)
+    if missing and structured:
+        more, missing = lookup(structured, missing)
+        found.update(more)
+    return found, missing
+
+
+async def clean_stage(ctx: ScrapeContext):
+    # Harvest first: cleanup drops the <script> and <meta> tags it lives in
+    mark = time.perf_counter()
+    ctx.structured = await run_blocking(harvest, ctx.page.html) if ctx.page.html else {}
+    ctx.timings["structured"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    ctx.text = ctx.page.text
+    if ctx.text is None:
+        ctx.text = await run_blocking(html_to_text, ctx.page.html)
+        if http_cache and ctx.page.tier == "http":
+            # A later 304 for this page then skips the parse as well
+            await run_blocking(http_cache.put_text, ctx.request.url, ctx.page.html, ctx.text, TEXT_BACKEND)
+    ctx.timings["clean"] = time.perf_counter() - mark
+
+    request = ctx.request
+    if request.watch and watches:
+        mark = time.perf_counter()
+        # map-reduce merges per-chunk answers, so it always re-reads the whole page
+        ctx.watch = await run_blocking(
+            watches.check, request.url, question(request), ctx.text, request.mode == "single"
+        )
+        ctx.timings["watch"] = time.perf_counter() - mark
+        if ctx.watch.status == "unchanged":
+            ctx.answered_by = "watch"
+            return  # the stored result still holds
+
+    fields = request.fields or (list(EXTRACTORS[request.extractor].fields) if request.extractor else None)
+    if fields:
+        mark = time.perf_counter()
+        ctx.local, ctx.missing = await run_blocking(
+            resolve_fields, request, ctx.page.html, ctx.text, ctx.structured, fields
+        )
+        ctx.timings["rules"] = time.perf_counter() - mark
+        if not ctx.missing:
+            ctx.answered_by = "rules"
+            return  # nothing left for the LLM
+    if templates and request.mode == "single" and ctx.page.html:
+        mark = time.perf_counter()
+        found = await run_blocking(
+            templates.apply, request.url, template_key(question(request)), ctx.page.html, ctx.missing
+        )
+        ctx.timings["template"] = time.perf_counter() - mark
+        if found is not None:
+            ctx.local, ctx.missing = {**(ctx.local or {}), **found}, []
+            ctx.answered_by = "template"
+            return
+    if request.mode == "map_reduce":
+        return  # map-reduce packs its own windows (without the preamble)
+
+    mark = time.perf_counter()
+    text = ctx.text
+    if ctx.watch and ctx.watch.status == "partial":
+        text = "\n".join(ctx.watch.added)
+    ctx.preamble = preamble(ctx.structured)
+    preamble_tokens = count_tokens(ctx.preamble, MODEL) if ctx.preamble else 0
+    budget = max(budget_for(MODEL) - preamble_tokens, 0)
+    if RANK_CHUNKS:
+        ctx.budgeted = await run_blocking(select_chunks, text, request.prompt, MODEL, budget)
+    else:
+        ctx.budgeted = await run_blocking(fit_to_budget, text, MODEL, budget)
+    ctx.timings["budget"] = time.perf_counter() - mark
+    ctx.tokens = {
+        "sent": ctx.budgeted.tokens_sent + preamble_tokens,
+        "dropped": ctx.budgeted.tokens_dropped,
+        "budget": budget_for(MODEL),
+        "structured": preamble_tokens,
+    }
+
+
+async def extract_stage(ctx: ScrapeContext):
+    if not needs_llm(ctx):
+        await answer_locally(ctx)
+        return
+    mark = time.perf_counter()
+    if ctx.request.mode == "map_reduce":
+        answer, ctx.tokens = await map_reduce(ctx.text, llm_prompt(ctx), MODEL, complete)
+    else:
+        answer = await complete(build_messages(llm_prompt(ctx), ctx.budgeted.text, ctx.preamble))
+    ctx.timings["llm"] = time.perf_counter() - mark
+    await settle(ctx, answer)
+
+
+async def extract_stream(ctx: ScrapeContext):
+    """extract_stage for /scrape/stream, as (event, data) pairs: the model's
+    deltas as they arrive, and the result unless it is just those deltas joined."""
+    if ctx.request.mode == "map_reduce" or not needs_llm(ctx):
+        await extract_stage(ctx)
+        yield "result", {"result": ctx.result}
+        return
+    yield "tokens_in", ctx.tokens
+    mark = time.perf_counter()
+    parts = []
+    async for delta in stream_complete(build_messages(llm_prompt(ctx), ctx.budgeted.text, ctx.preamble)):
+        if "llm_first_token" not in ctx.timings:
+            ctx.timings["llm_first_token"] = time.perf_counter() - mark
+        parts.append(delta)
+        yield "token", {"delta": delta}
+    ctx.timings["llm"] = time.perf_counter() - mark
+    await settle(ctx, "".join(parts))
+    if ctx.local is not None:
+        yield "result", {"result": ctx.result}
+
+
+async def answer_locally(ctx: ScrapeContext):
+    if ctx.watch and ctx.watch.status == "unchanged":
+        ctx.result = ctx.watch.previous  # already recorded
+        return
+    ctx.result = ctx.local
+    await remember(ctx)
+
+
+async def settle(ctx: ScrapeContext, answer):
+    """Turns the model's answer into the result, however it was obtained."""
+    ctx.result = merge_local(ctx, answer)
+    ctx.answered_by = "llm"
+    await remember(ctx)
+
+
+async def remember(ctx: ScrapeContext):
+    """Keeps the answer for watch mode and as a sample for selector templates."""
+    if ctx.watch and ctx.watch.status != "unchanged":
+        await run_blocking(watches.record, ctx.request.url, ctx.watch, ctx.result)
+    if templates and ctx.answered_by == "llm" and ctx.request.mode == "single" and ctx.page.html:
+        result = ctx.result if isinstance(ctx.result, dict) else parse_json(ctx.result)
+        # a diff answer in watch mode only covers part of the page
+        if isinstance(result, dict) and not (ctx.watch and ctx.watch.status == "partial"):
+            await templates.learn(ctx.request.url, template_key(question(ctx.request)), ctx.page.html, result)
+
+
+STAGES = (fetch_stage, clean_stage, extract_stage)
+
+
+async def run_scrape(request: ScrapeRequest) -> dict:
+    """Runs all stages back to back for one request (the /scrape path)."""
+    ctx = ScrapeContext(request)
+    for stage in STAGES:
+        await stage(ctx)
+    return ctx.response()
+
+
+# ─── QUEUED PIPELINE ──────────────────────────────────────
+class Stage:
+    def __init__(self, name: str, fn, workers: int, queue_size: int = QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.inbox = asyncio.Queue(maxsize=queue_size)
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self.inbox.qsize(),
+            "processed": self.processed,
+            "failed": self.failed,
+            # items/s one worker sustains while busy
+            "per_worker_rate": round(self.processed / self.busy_seconds, 2) if self.busy_seconds else None,
+        }
+
+
+class Pipeline:
+    """Stages joined by bounded queues, so fetch, parse and LLM work overlap
+    across URLs. A full queue blocks the stage in front of it (backpressure)."""
+
+    def __init__(self, stages: list[Stage]):
+        self.stages = stages
+        self.tasks: list[asyncio.Task] = []
+        self.started_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        for i, stage in enumerate(self.stages):
+            downstream = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            self.tasks += [
+                asyncio.create_task(self._work(stage, downstream)) for _ in range(stage.workers)
+            ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+
+    async def submit(self, request: ScrapeRequest) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.stages[0].inbox.put((ScrapeContext(request), future))
+        return await future
+
+    async def _work(self, stage: Stage, downstream: Stage | None):
+        while True:
+            ctx, future = await stage.inbox.get()
+            stage.busy += 1
+            mark = time.perf_counter()
+            try:
+                await stage.fn(ctx)
+            except Exception as e:
+                stage.failed += 1
+                record_error(e)
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                stage.busy -= 1
+                stage.busy_seconds += time.perf_counter() - mark
+            stage.processed += 1
+            if future.done():  # submitter went away
+                continue
+            if downstream is None:
+                future.set_result(ctx.response())
+            else:
+                await downstream.inbox.put((ctx, future))
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self.started_at if self.started_at else 0
+        return {
+            stage.name: {
+                **stage.stats(),
+                "throughput": round(stage.processed / uptime, 2) if uptime else None,
+            }
+            for stage in self.stages
+        }
+
+
+pipeline = Pipeline([
+    Stage("fetch", fetch_stage, FETCH_WORKERS),
+    Stage("clean", clean_stage, CLEAN_WORKERS),
+    Stage("extract", extract_stage, EXTRACT_WORKERS),
+])
@@ -0,0 +1,230 @@
+# politeness.py (per-domain request scheduling: concurrency caps, spacing and backoff)
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+
+from metrics import backoffs
+from urls import normalize_url, registrable_domain
+
+# ─── CONFIG ───────────────────────────────────────────────
+POLITENESS_ENABLED = os.getenv("POLITENESS", "1") == "1"
+MAX_PER_DOMAIN = int(os.getenv("POLITENESS_MAX_PER_DOMAIN", 2))  # requests on the wire at once
+MIN_GAP = float(os.getenv("POLITENESS_MIN_GAP_MS", 500)) / 1000  # between request starts
+BACKOFF_BASE = float(os.getenv("POLITENESS_BACKOFF_S", 5))  # doubles with each strike
+BACKOFF_MAX = float(os.getenv("POLITENESS_BACKOFF_MAX_S", 300))
+# per-domain overrides, e.g. {"example.com": {"max": 8, "gap_ms": 0}}
+OVERRIDES = json.loads(os.getenv("POLITENESS_DOMAINS", "{}"))
+MAX_DOMAINS = 10000  # idle domain states kept before they are dropped
+BACKOFF_STATUSES = {429, 503}  # responses that pause the domain
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Retry-After as seconds; the header holds either a delay or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class BackingOff(Exception):
+    """Raised by slot() instead of sleeping through a domain's backoff."""
+
+    def __init__(self, domain: str, seconds: float):
+        super().__init__(f"{domain} asked us to slow down, retry in {seconds:.0f}s")
+        self.domain = domain
+        self.seconds = seconds
+
+
+@dataclass
+class DomainState:
+    limit: int
+    gap: float
+    sem: asyncio.Semaphore = field(init=False)
+    active: int = 0  # requests on the wire
+    waiting: int = 0  # callers queued in slot()
+    reserved: int = 0  # job items claimed for the domain that have not reached slot() yet
+    next_at: float = 0.0  # monotonic time the next request may start
+    backoff_until: float = 0.0
+    strikes: int = 0  # consecutive throttled responses
+    requests: int = 0
+
+    def __post_init__(self):
+        self.sem = asyncio.Semaphore(self.limit)
+
+    @property
+    def load(self) -> int:
+        return self.active + self.waiting + self.reserved
+
+    def ready_at(self) -> float:
+        return max(self.next_at, self.backoff_until)
+
+
+class DomainScheduler:
+    """Gates every network fetch per registrable domain: at most `limit`
+    requests at once, starts spaced by `gap`, and a growing pause after the
+    site pushes back. Waiting happens per domain, so other hosts are not held
+    up; the job queue also asks blocked() to skip domains that are busy.
+    Only the spacing gap is waited out: a domain in backoff raises BackingOff
+    so no caller holds a slot, or a worker, for minutes."""
+
+    def __init__(self, limit=MAX_PER_DOMAIN, gap=MIN_GAP, overrides=OVERRIDES):
+        self.limit = limit
+        self.gap = gap
+        self.overrides = overrides
+        self.domains: dict[str, DomainState] = {}
+        self._reservations: dict[str, int] = {}  # url key -> claimed job items
+        self.on_ready = None  # called when a domain frees capacity
+
+    def _state(self, domain: str) -> DomainState:
+        state = self.domains.get(domain)
+        if state is None:
+            if len(self.domains) >= MAX_DOMAINS:
+                self._prune()
+            override = self.overrides.get(domain, {})
+            state = self.domains[domain] = DomainState(
+                int(override.get("max", self.limit)),
+                float(override.get("gap_ms", self.gap * 1000)) / 1000,
+            )
+        return state
+
+    def _prune(self):
+        now = time.monotonic()
+        for domain, state in list(self.domains.items()):
+            if state.load == 0 and state.ready_at() <= now and not state.strikes:
+                del self.domains[domain]
+
+    # ─── SCHEDULING ────────────────────────────────────────
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Waits for the domain's turn, then holds one of its request slots."""
+        domain = registrable_domain(url)
+        state = self._state(domain)
+        self._unreserve(normalize_url(url), state)
+        self._refuse_backoff(domain, state)
+        state.waiting += 1
+        try:
+            await state.sem.acquire()
+        finally:
+            state.waiting -= 1
+        state.active += 1
+        try:
+            # Loops because another holder, or a backoff, may move the gate while we sleep
+            while (delay := state.ready_at() - time.monotonic()) > 0:
+                self._refuse_backoff(domain, state)
+                await asyncio.sleep(delay)
+            state.next_at = time.monotonic() + state.gap
+            state.requests += 1
+            yield
+        finally:
+            state.active -= 1
+            state.sem.release()
+            self._notify()
+
+    @staticmethod
+    def _refuse_backoff(domain: str, state: DomainState):
+        left = state.backoff_until - time.monotonic()
+        if left > 0:
+            raise BackingOff(domain, left)
+
+    @asynccontextmanager
+    async def reserve(self, url: str):
+        """Counts a claimed job item against its domain until its fetch starts
+        (or it finishes without one, e.g. from a cache), so parallel workers
+        do not claim more of one domain than it will serve."""
+        key = normalize_url(url)
+        state = self._state(registrable_domain(url))
+        state.reserved += 1
+        self._reservations[key] = self._reservations.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self._unreserve(key, state)
+
+    def _unreserve(self, key: str, state: DomainState):
+        count = self._reservations.get(key)
+        if not count:
+            return
+        if count == 1:
+            del self._reservations[key]
+        else:
+            self._reservations[key] = count - 1
+        state.reserved -= 1
+        self._notify()
+
+    def _notify(self):
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def blocked(self) -> list[str]:
+        """Domains that cannot start another request right now."""
+        now = time.monotonic()
+        return [
+            domain for domain, state in self.domains.items()
+            if state.load >= state.limit or state.ready_at() > now
+        ]
+
+    def backoff_left(self, url: str) -> float:
+        """Seconds until the domain's backoff ends, 0 when it is not paused."""
+        state = self.domains.get(registrable_domain(url))
+        return max(state.backoff_until - time.monotonic(), 0) if state else 0
+
+    def next_ready_in(self) -> float | None:
+        """Seconds until the earliest spacing or backoff gate opens."""
+        now = time.monotonic()
+        gates = [state.ready_at() - now for state in self.domains.values() if state.ready_at() > now]
+        return min(gates) if gates else None
+
+    # ─── FEEDBACK ──────────────────────────────────────────
+    def penalize(self, url: str, reason: str, retry_after: float | None = None):
+        domain = registrable_domain(url)
+        state = self._state(domain)
+        now = time.monotonic()
+        backoffs.labels(reason=reason).inc()
+        if state.backoff_until > now:
+            return  # requests sent before the pause began; it already covers them
+        state.strikes += 1
+        delay = BACKOFF_BASE * 2 ** (state.strikes - 1)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        delay = min(delay, BACKOFF_MAX)
+        state.backoff_until = now + delay
+        print(f"Backing off {domain} for {delay:.0f}s ({reason}, strike {state.strikes})")
+
+    def succeeded(self, url: str):
+        state = self.domains.get(registrable_domain(url))
+        if state is not None:
+            state.strikes = 0
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        backing_off = {
+            domain: {"seconds_left": round(state.backoff_until - now, 1), "strikes": state.strikes}
+            for domain, state in self.domains.items() if state.backoff_until > now
+        }
+        busy = {
+            domain: {
+                "active": state.active, "waiting": state.waiting,
+                "reserved": state.reserved, "limit": state.limit,
+            }
+            for domain, state in self.domains.items() if state.load
+        }
+        return {
+            "limit": self.limit,
+            "min_gap_ms": self.gap * 1000,
+            "domains": len(self.domains),
+            "busy": busy,
+            "backing_off": backing_off,
+        }
+
+
+politeness = DomainScheduler() if POLITENESS_ENABLED else None
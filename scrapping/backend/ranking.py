@@ -0,0 +1,93 @@
+# ranking.py (pick the page chunks that matter for the prompt, BM25)
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+from budget import Budgeted, budget_for, count_tokens, fit_to_budget, normalize_whitespace
+
+# ─── CONFIG ───────────────────────────────────────────────
+RANK_CHUNKS = os.getenv("RANK_CHUNKS", "1") == "1"  # 0 = plain head-of-page cut
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", 120))
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_WORDS = re.compile(r"\w+")
+
+
+def terms(text: str) -> list[str]:
+    # Lower-case words with a naive plural strip so "emails" matches "email"
+    out = []
+    for word in _WORDS.findall(text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        out.append(word)
+    return out
+
+
+def split_chunks(text: str, max_words: int = CHUNK_WORDS) -> list[str]:
+    """Groups lines into chunks of about max_words; long lines are split on words."""
+    chunks, current, size = [], [], 0
+    for line in text.split("\n"):
+        words = line.split()
+        while words:
+            room = max_words - size
+            if room <= 0:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+                continue
+            piece, words = words[:room], words[room:]
+            current.append(" ".join(piece))
+            size += len(piece)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class BM25:
+    """In-memory inverted index over a list of chunks."""
+
+    def __init__(self, docs: list[str]):
+        self.doc_lengths = []
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        for i, doc in enumerate(docs):
+            counts = Counter(terms(doc))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        self.avg_length = sum(self.doc_lengths) / max(len(docs), 1)
+
+    def scores(self, query: str) -> list[float]:
+        n = len(self.doc_lengths)
+        scores = [0.0] * n
+        for term in set(terms(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[i] / (self.avg_length or 1))
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+
+def select_chunks(text: str, query: str, model: str, budget: int | None = None) -> Budgeted:
+    """Fills the token budget with the best-ranked chunks, kept in page order."""
+    budget = budget_for(model) if budget is None else budget
+    chunks = split_chunks(normalize_whitespace(text))
+    sizes = [count_tokens(chunk, model) for chunk in chunks]
+    total = sum(sizes)
+    if total <= budget:
+        return Budgeted("\n".join(chunks), total, 0, budget)
+
+    scores = BM25(chunks).scores(query)
+    # Unmatched chunks tie at 0 and fall back to page order
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    picked, used = [], 0
+    for i in ranked:
+        if used + sizes[i] <= budget:
+            picked.append(i)
+            used += sizes[i]
+    if not picked:  # budget smaller than any chunk
+        return fit_to_budget(text, model, budget)
+    return Budgeted("\n".join(chunks[i] for i in sorted(picked)), used, total - used, budget)
@@ -0,0 +1,56 @@
+# readiness.py (decides when a rendered page has settled)
+import os
+import time
+
+# ─── CONFIG ───────────────────────────────────────────────
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", 10))
+QUIET_MS = float(os.getenv("READY_QUIET_MS", 500))
+MAX_INFLIGHT = int(os.getenv("READY_MAX_INFLIGHT", 0))
+POLL_INTERVAL = float(os.getenv("READY_POLL_INTERVAL", 0.1))
+
+# Installed on every new document (see driver_pool.new_driver) so it sees
+# mutations and XHR/fetch calls from the very first script on the page.
+INSTRUMENT_JS = """
+(() => {
+  if (window.__scrapeReady) return;
+  const s = window.__scrapeReady = {inflight: 0, lastMutation: performance.now()};
+  new MutationObserver(() => { s.lastMutation = performance.now(); })
+    .observe(document, {childList: true, subtree: true, characterData: true});
+  const origFetch = window.fetch;
+  if (origFetch) {
+    window.fetch = function () {
+      s.inflight++;
+      return origFetch.apply(this, arguments).finally(() => { s.inflight--; });
+    };
+  }
+  const origSend = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    s.inflight++;
+    this.addEventListener("loadend", () => { s.inflight--; }, {once: true});
+    return origSend.apply(this, arguments);
+  };
+})();
+"""
+
+_PROBE_JS = """
+const s = window.__scrapeReady;
+return [document.readyState, s ? s.inflight : 0, s ? performance.now() - s.lastMutation : null];
+"""
+
+
+def is_settled(state, inflight, quiet_ms, quiet_needed=QUIET_MS, max_inflight=MAX_INFLIGHT):
+    if state == "loading" or inflight > max_inflight:
+        return False
+    # Without instrumentation fall back to readyState alone
+    return quiet_ms is None or quiet_ms >= quiet_needed
+
+
+def wait_until_ready(driver, timeout=READY_TIMEOUT):
+    """Polls the page until the DOM and network go quiet; returns seconds waited."""
+    started = time.perf_counter()
+    deadline = started + timeout
+    while True:
+        state, inflight, quiet_ms = driver.execute_script(_PROBE_JS)
+        if is_settled(state, inflight, quiet_ms) or time.perf_counter() >= deadline:
+            return time.perf_counter() - started
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,67 @@
+# resource_policy.py (which sub-resources the browser may download)
+import json
+import os
+
+from urls import domain_of
+
+# ─── CONFIG ───────────────────────────────────────────────
+DEFAULT_BLOCKED = os.getenv("RESOURCE_BLOCK_DEFAULT", "image,font,media,tracker").split(",")
+# e.g. {"shop.example.com": ["image"], "app.example.com": []}
+DOMAIN_BLOCKED = json.loads(os.getenv("RESOURCE_BLOCK_BY_DOMAIN", "{}"))
+EXTRA_TRACKER_HOSTS = [h for h in os.getenv("TRACKER_HOSTS", "").split(",") if h]
+
+EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico", "bmp"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "ogg", "mp3", "wav", "m4a", "mov", "m3u8", "ts"],
+    "stylesheet": ["css"],
+}
+TRACKER_HOSTS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "adservice.google.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.io",
+    "cdn.segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "newrelic.com",
+    "nr-data.net",
+    "clarity.ms",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "adnxs.com",
+] + EXTRA_TRACKER_HOSTS
+
+def blocked_categories(url: str, override: list[str] | None = None) -> list[str]:
+    # Request override beats the per-domain setting, which beats the default
+    if override is not None:
+        return override
+    domain = domain_of(url)
+    while domain:
+        if domain in DOMAIN_BLOCKED:
+            return DOMAIN_BLOCKED[domain]
+        domain = domain.partition(".")[2]
+    return DEFAULT_BLOCKED
+
+
+def url_patterns(categories: list[str]) -> list[str]:
+    patterns = []
+    for category in categories:
+        if category == "tracker":
+            patterns += [f"*://*{host}/*" for host in TRACKER_HOSTS]
+        for ext in EXTENSIONS.get(category, []):
+            patterns += [f"*.{ext}", f"*.{ext}?*"]
+    return patterns
+
+
+def apply_policy(driver, categories: list[str]):
+    # Always set (possibly empty) so a pooled driver never keeps a previous policy
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": url_patterns(categories)})
@@ -0,0 +1,41 @@
+# singleflight.py (share one in-flight call between identical concurrent callers)
+import asyncio
+
+
+class SingleFlight:
+    """Concurrent do() calls with the same key await one shared task.
+
+    The task is shielded, so a caller that disconnects does not cancel the
+    work for everybody else waiting on it.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        return await asyncio.shield(self.task(key, fn))
+
+    def task(self, key: str, fn) -> asyncio.Task:
+        """The shared task for key, starting fn() if none is running. Registers
+        before returning, so callers that need the task itself can't race."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        return task
+
+    def _done(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    def __len__(self):
+        return len(self._inflight)
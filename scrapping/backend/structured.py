@@ -0,0 +1,221 @@
+# structured.py (JSON-LD, microdata and OpenGraph embedded in the raw HTML)
+import html as html_lib
+import json
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+from html_text import etree  # lxml, when installed
+
+# ─── CONFIG ───────────────────────────────────────────────
+# upper bound on the structured-data preamble sent ahead of the page text
+PREAMBLE_CHARS = int(os.getenv("STRUCTURED_PREAMBLE_CHARS", 2000))
+
+_JSON_LD = re.compile(
+    r"""<script[^>]+type\s*=\s*["']application/ld\+json["'][^>]*>(.*?)</script>""", re.I | re.S
+)
+_META = re.compile(r"<meta\b[^>]*>", re.I)
+_ATTR = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_OG_PREFIXES = ("og:", "article:", "product:", "twitter:")
+# microdata: elements whose value is an attribute rather than their text
+_VALUE_ATTRS = {
+    "a": "href", "area": "href", "link": "href", "img": "src", "audio": "src", "video": "src",
+    "source": "src", "iframe": "src", "embed": "src", "time": "datetime", "data": "value", "meter": "value",
+}
+
+ORGANIZATION_TYPES = {"Organization", "Corporation", "LocalBusiness", "Store", "Restaurant", "ContactPoint"}
+
+# field -> (schema.org types it must come from, or None for any; properties; meta property)
+FIELD_SOURCES = {
+    "company_name": (ORGANIZATION_TYPES, ("legalName", "name"), "og:site_name"),
+    "emails": (None, ("email",), None),
+    "phones": (None, ("telephone",), None),
+    "addresses": (None, ("address",), None),
+    "title": (None, ("headline", "name"), "og:title"),
+    "description": (None, ("description",), "og:description"),
+    "image": (None, ("image",), "og:image"),
+    "price": (None, ("price", "lowPrice"), "product:price:amount"),
+    "currency": (None, ("priceCurrency",), "product:price:currency"),
+    "author": (None, ("author",), "article:author"),
+    "published": (None, ("datePublished",), "article:published_time"),
+}
+
+
+# ─── HARVESTING ───────────────────────────────────────────
+def json_ld(html: str) -> list:
+    items = []
+    for block in _JSON_LD.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except json.JSONDecodeError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and "@graph" in item:
+                items.extend(item["@graph"])
+            else:
+                items.append(item)
+    return items
+
+
+def opengraph(html: str) -> dict:
+    meta = {}
+    for tag in _META.findall(html):
+        attrs = {k.lower(): a or b for k, a, b in _ATTR.findall(tag)}
+        key = attrs.get("property") or attrs.get("name") or ""
+        if key.startswith(_OG_PREFIXES) and "content" in attrs:
+            meta.setdefault(key, html_lib.unescape(attrs["content"]))
+    return meta
+
+
+# The microdata walk reads elements through these, so it runs on an lxml tree
+# (fast) or, without lxml, on BeautifulSoup's html.parser tree
+def _tag(el) -> str:
+    return el.tag if etree is not None else el.name
+
+
+def _children(el):
+    if etree is not None:
+        return [child for child in el if isinstance(child.tag, str)]  # skips comments
+    return el.find_all(True, recursive=False)
+
+
+def _text(el) -> str:
+    return " ".join(el.itertext()) if etree is not None else el.get_text(" ")
+
+
+def _microdata_value(el):
+    if el.get("itemscope") is not None:
+        return _microdata_item(el)
+    if el.get("content") is not None:
+        return el.get("content")
+    attr = _VALUE_ATTRS.get(_tag(el))
+    if attr and el.get(attr) is not None:
+        return el.get(attr)
+    return " ".join(_text(el).split())
+
+
+def _microdata_props(el):
+    # itemprops owned by this item, not by an item nested inside it
+    for child in _children(el):
+        if child.get("itemprop") is not None:
+            yield child
+        if child.get("itemscope") is None:
+            yield from _microdata_props(child)
+
+
+def _microdata_item(el) -> dict:
+    item = {}
+    if el.get("itemtype"):
+        item["@type"] = el.get("itemtype").split()[0].rstrip("/").rsplit("/", 1)[-1]
+    for prop in _microdata_props(el):
+        value = _microdata_value(prop)
+        for name in prop.get("itemprop").split():
+            if name not in item:
+                item[name] = value
+            elif isinstance(item[name], list):
+                item[name].append(value)
+            else:
+                item[name] = [item[name], value]
+    return item
+
+
+def microdata(html: str) -> list:
+    if "itemscope" not in html:
+        return []  # skip the parse on the many pages without microdata
+    if etree is not None:
+        root = etree.HTML(html.encode("utf-8", "replace"))
+        tops = root.xpath("//*[@itemscope][not(@itemprop)]") if root is not None else []
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+        tops = [el for el in soup.find_all(itemscope=True) if not el.has_attr("itemprop")]
+    return [_microdata_item(el) for el in tops]
+
+
+def harvest(html: str) -> dict:
+    """Structured data from the raw page, before cleanup strips <script>/<meta>.
+    Empty sources are left out, so a page without any returns {}."""
+    found = {"json_ld": json_ld(html), "microdata": microdata(html), "opengraph": opengraph(html)}
+    return {source: data for source, data in found.items() if data}
+
+
+# ─── FIELD LOOKUP ─────────────────────────────────────────
+def types_of(node: dict) -> set:
+    kind = node.get("@type", [])
+    return set(kind if isinstance(kind, list) else [kind])
+
+
+def nodes(items: list) -> list[dict]:
+    """Every object in the items, nested ones included, outermost first."""
+    out, stack = [], list(items)
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            out.append(node)
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+    return out
+
+
+def postal_address(address) -> str | None:
+    if isinstance(address, str):
+        return address
+    if not isinstance(address, dict):
+        return None
+    region = " ".join(filter(None, [address.get("addressRegion"), address.get("postalCode")]))
+    country = address.get("addressCountry")
+    if isinstance(country, dict):
+        country = country.get("name")
+    parts = [address.get("streetAddress"), address.get("addressLocality"), region, country]
+    return ", ".join(str(p) for p in parts if p) or None
+
+
+def _plain(prop: str, value):
+    if prop == "address":
+        return postal_address(value)
+    if isinstance(value, dict):
+        return value.get("name") or value.get("url") or value.get("@id")
+    return value
+
+
+def lookup(structured: dict, fields: list[str]) -> tuple[dict, list[str]]:
+    """Answers fields from harvested data: plural fields collect every value,
+    singular ones take the first. Returns (found, missing)."""
+    all_nodes = nodes(structured.get("json_ld", []) + structured.get("microdata", []))
+    meta = structured.get("opengraph", {})
+    found = {}
+    for field in fields:
+        singular = field[:-1] if field.endswith("s") else field
+        types, props, meta_key = FIELD_SOURCES.get(field, (None, (field, singular), f"og:{field}"))
+        values = []
+        for node in all_nodes:
+            if types and not types_of(node) & types:
+                continue
+            for prop in props:
+                value = node.get(prop)
+                for v in value if isinstance(value, list) else [value]:
+                    v = _plain(prop, v)
+                    if v not in (None, "") and v not in values:
+                        values.append(v)
+        if meta_key and meta.get(meta_key) and meta[meta_key] not in values:
+            values.append(meta[meta_key])
+        if values:
+            found[field] = values if field.endswith("s") else values[0]
+    return found, [f for f in fields if f not in found]
+
+
+def _without_context(node):
+    if isinstance(node, dict):
+        return {k: _without_context(v) for k, v in node.items() if k != "@context"}
+    if isinstance(node, list):
+        return [_without_context(v) for v in node]
+    return node
+
+
+def preamble(structured: dict, limit: int = PREAMBLE_CHARS) -> str | None:
+    """Compact JSON of the harvested data for the prompt, cut at limit chars."""
+    if not structured:
+        return None
+    text = json.dumps(_without_context(structured), ensure_ascii=False, separators=(",", ":"))
+    return text if len(text) <= limit else text[:limit] + "…"
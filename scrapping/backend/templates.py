@@ -0,0 +1,357 @@
+# templates.py (per-domain CSS/XPath selector templates learned from LLM answers)
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from concurrency import run_blocking
+from llm import complete
+from mapreduce import parse_json
+from urls import domain_of
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional, C-backed
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:  # optional; without it XPath selectors never match
+    lxml = None
+
+# ─── CONFIG ───────────────────────────────────────────────
+TEMPLATES_ENABLED = os.getenv("SELECTOR_TEMPLATES", "1") == "1"
+TEMPLATES_DB_PATH = os.getenv("TEMPLATES_DB_PATH", "data/templates.sqlite3")
+# LLM extractions on a domain (per prompt) before selectors are induced
+TEMPLATE_AFTER = int(os.getenv("TEMPLATE_AFTER", 3))
+# consecutive pages a template fails on before it is dropped and relearned
+TEMPLATE_MAX_FAILURES = int(os.getenv("TEMPLATE_MAX_FAILURES", 3))
+# rejected inductions before a (domain, prompt) is left to the LLM; each one
+# doubles the samples collected before the next try
+TEMPLATE_MAX_ATTEMPTS = int(os.getenv("TEMPLATE_MAX_ATTEMPTS", 3))
+TEMPLATE_HTML_CHARS = int(os.getenv("TEMPLATE_HTML_CHARS", 12000))
+
+INDUCE_PROMPT = (
+    "You write CSS selectors for web scraping. You get the values a previous run "
+    "extracted from a page and the page's HTML. For every field, give a selector that "
+    "finds that value on this page and on other pages of the same site built from the "
+    "same template. Prefer stable ids, itemprop and class names over positions. Answer "
+    'with JSON only, shaped like {"field": {"css": "selector", "attr": null, "many": false}}: '
+    '"attr" names the attribute holding the value (null for the element text), "many" is '
+    'true when the field is a list, and "xpath" may replace "css" where CSS cannot express '
+    "it. Use null for fields whose value is empty."
+)
+
+_NOISE = re.compile(r"<(script|style|svg|noscript)\b.*?</\1>|<!--.*?-->", re.I | re.S)
+_SPACE = re.compile(r"\s+")
+
+
+def template_key(options: dict) -> str:
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+
+# ─── APPLYING SELECTORS ───────────────────────────────────
+def _clean(value: str | None) -> str | None:
+    value = _SPACE.sub(" ", value or "").strip()
+    return value or None
+
+
+class _Page:
+    """Parses lazily, once per engine the selectors need."""
+
+    def __init__(self, html: str):
+        self.html = html
+        self._css = self._tree = None
+
+    def css(self, selector: str, attr: str | None) -> list[str]:
+        if LexborHTMLParser is not None:
+            if self._css is None:
+                self._css = LexborHTMLParser(self.html)
+            nodes = self._css.css(selector)
+            return [_clean(n.attributes.get(attr) if attr else n.text(separator=" ")) for n in nodes]
+        if self._css is None:
+            self._css = BeautifulSoup(self.html, "html.parser")
+        nodes = self._css.select(selector)
+        return [_clean(n.get(attr) if attr else n.get_text(" ")) for n in nodes]
+
+    def xpath(self, expression: str, attr: str | None) -> list[str]:
+        if lxml is None:
+            return []
+        if self._tree is None:
+            self._tree = lxml.html.fromstring(self.html)
+        out = []
+        for node in self._tree.xpath(expression):
+            if isinstance(node, str):
+                out.append(_clean(node))
+            else:
+                out.append(_clean(node.get(attr) if attr else node.text_content()))
+        return out
+
+
+def apply_selectors(html: str, selectors: dict) -> dict:
+    page = _Page(html)
+    values = {}
+    for field, spec in selectors.items():
+        if not spec:
+            values[field] = None
+            continue
+        try:
+            found = page.xpath(spec["xpath"], spec.get("attr")) if spec.get("xpath") else page.css(spec["css"], spec.get("attr"))
+        except Exception:
+            found = []  # a selector the engine rejects simply matches nothing
+        found = list(dict.fromkeys(v for v in found if v))
+        values[field] = found if spec.get("many") else (found[0] if found else None)
+    return values
+
+
+def _norm(value):
+    if value in (None, "", [], {}):
+        return None
+    if isinstance(value, list):
+        return tuple(sorted({str(_norm(v)) for v in value if _norm(v) is not None})) or None
+    text = _SPACE.sub(" ", str(value)).strip().lower()
+    try:
+        return str(float(text.replace(",", "")))
+    except ValueError:
+        return text
+
+
+def agrees(expected: dict, got: dict) -> bool:
+    return all(_norm(expected.get(f)) == _norm(got.get(f)) for f in expected)
+
+
+def html_excerpt(html: str, result: dict, limit: int = TEMPLATE_HTML_CHARS) -> str:
+    """The page without scripts/styles; if still too long, the windows around
+    the extracted values, which is where the selectors have to point."""
+    html = _SPACE.sub(" ", _NOISE.sub("", html))
+    if len(html) <= limit:
+        return html
+    values = []
+    for value in result.values():
+        values += value if isinstance(value, list) else [value]
+    spans = []
+    for value in values:
+        at = html.find(str(value)[:40]) if value not in (None, "") else -1
+        if at >= 0:
+            spans.append((max(at - 1500, 0), at + 1500))
+    excerpt, used = [], 0
+    for start, end in sorted(spans):
+        if excerpt and start <= excerpt[-1][1]:
+            excerpt[-1] = (excerpt[-1][0], max(end, excerpt[-1][1]))
+        else:
+            excerpt.append((start, end))
+    parts = [html[start:end] for start, end in excerpt] or [html]
+    return " … ".join(parts)[:limit]
+
+
+# ─── STORE ────────────────────────────────────────────────
+class TemplateStore:
+    """Recent LLM answers per (domain, prompt) and the selectors learned from them."""
+
+    def __init__(self, path=TEMPLATES_DB_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.active = {}  # (domain, key) -> selectors
+        self._inducing = set()
+        self._tasks = set()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS template_samples (
+                id INTEGER PRIMARY KEY,
+                domain TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                html BLOB NOT NULL,
+                result TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS template_samples_key ON template_samples (domain, key);
+            CREATE TABLE IF NOT EXISTS templates (
+                domain TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'learning',
+                selectors TEXT,
+                samples_seen INTEGER NOT NULL DEFAULT 0,
+                induced_at INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL,
+                PRIMARY KEY (domain, key)
+            );
+            """
+        )
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(templates)")}
+        if "attempts" not in columns:
+            self.db.execute("ALTER TABLE templates ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        for domain, key, selectors in self.db.execute(
+            "SELECT domain, key, selectors FROM templates WHERE status = 'active'"
+        ):
+            self.active[(domain, key)] = json.loads(selectors)
+
+    def apply(self, url: str, key: str, html: str, fields: list[str] | None) -> dict | None:
+        """Values for fields (all template fields when None) from the domain's
+        template, or None when there is none or it no longer fits the page."""
+        domain = domain_of(url)
+        selectors = self.active.get((domain, key))
+        if selectors is None or (fields and not set(fields) <= set(selectors)):
+            return None
+        wanted = {f: selectors[f] for f in (fields or selectors)}
+        values = apply_selectors(html, wanted)
+        if any(spec and values[f] in (None, []) for f, spec in wanted.items()):
+            self._missed(domain, key)
+            return None
+        with self._lock:
+            self.db.execute(
+                "UPDATE templates SET hits = hits + 1, failures = 0 WHERE domain = ? AND key = ?",
+                (domain, key),
+            )
+        return values
+
+    def _missed(self, domain: str, key: str):
+        with self._lock:
+            failures = self.db.execute(
+                "UPDATE templates SET failures = failures + 1 WHERE domain = ? AND key = ? RETURNING failures",
+                (domain, key),
+            ).fetchone()[0]
+            if failures >= TEMPLATE_MAX_FAILURES:
+                # The site changed its layout; learn again from fresh LLM answers
+                print(f"Selector template for {domain} failed {failures} times, dropping it")
+                self.db.execute(
+                    "UPDATE templates SET status = 'failed', induced_at = samples_seen, updated_at = ? "
+                    "WHERE domain = ? AND key = ?",
+                    (time.time(), domain, key),
+                )
+                self.active.pop((domain, key), None)
+
+    def add_sample(self, url: str, key: str, html: str, result: dict) -> bool:
+        """Keeps the answer as a sample; True when it's time to induce a template."""
+        domain = domain_of(url)
+        with self._lock:
+            self.db.execute(
+                "INSERT INTO template_samples (domain, key, url, html, result) VALUES (?, ?, ?, ?, ?)",
+                (domain, key, url, zlib.compress(html.encode("utf-8")), json.dumps(result)),
+            )
+            self.db.execute(
+                "DELETE FROM template_samples WHERE domain = ? AND key = ? AND id NOT IN "
+                "(SELECT id FROM template_samples WHERE domain = ? AND key = ? ORDER BY id DESC LIMIT ?)",
+                (domain, key, domain, key, TEMPLATE_AFTER),
+            )
+            status, seen, induced_at, attempts = self.db.execute(
+                "INSERT INTO templates (domain, key, samples_seen) VALUES (?, ?, 1) "
+                "ON CONFLICT (domain, key) DO UPDATE SET samples_seen = samples_seen + 1 "
+                "RETURNING status, samples_seen, induced_at, attempts",
+                (domain, key),
+            ).fetchone()
+        # Every induction is a paid call with a large prompt, so pages that
+        # resist templating are retried ever more rarely, then not at all
+        return (
+            status != "active"
+            and attempts < TEMPLATE_MAX_ATTEMPTS
+            and seen - induced_at >= TEMPLATE_AFTER * 2 ** attempts
+        )
+
+    def samples(self, domain: str, key: str) -> list[tuple[str, dict]]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT html, result FROM template_samples WHERE domain = ? AND key = ? ORDER BY id DESC",
+                (domain, key),
+            ).fetchall()
+        return [(zlib.decompress(html).decode("utf-8"), json.loads(result)) for html, result in rows]
+
+    def save(self, domain: str, key: str, selectors: dict | None, active: bool):
+        with self._lock:
+            attempts = self.db.execute(
+                "UPDATE templates SET status = ?, selectors = ?, induced_at = samples_seen, failures = 0, "
+                "attempts = CASE WHEN ? THEN 0 ELSE attempts + 1 END, updated_at = ? "
+                "WHERE domain = ? AND key = ? RETURNING attempts",
+                ("active" if active else "rejected", json.dumps(selectors), active, time.time(), domain, key),
+            ).fetchone()[0]
+        if active:
+            self.active[(domain, key)] = selectors
+        elif attempts >= TEMPLATE_MAX_ATTEMPTS:
+            print(f"Giving up on a selector template for {domain} after {attempts} rejected attempts")
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT domain, status, samples_seen, attempts, hits, failures, selectors "
+                "FROM templates ORDER BY domain"
+            ).fetchall()
+        return [
+            {
+                "domain": domain,
+                "status": status,
+                "samples_seen": seen,
+                "attempts": attempts,
+                "hits": hits,
+                "failures": failures,
+                "selectors": json.loads(selectors) if selectors else None,
+            }
+            for domain, status, seen, attempts, hits, failures, selectors in rows
+        ]
+
+    def close(self):
+        with self._lock:  # lets a save still running in a worker thread finish
+            self.db.close()
+
+    # ─── LEARNING ──────────────────────────────────────────
+    async def stop(self):
+        """Cancels background inductions; an unfinished one is retried after
+        the next sample for its domain."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def learn(self, url: str, key: str, html: str, result: dict):
+        """Records an LLM answer; induces selectors in the background once the
+        domain has enough of them."""
+        if not await run_blocking(self.add_sample, url, key, html, result):
+            return
+        domain = domain_of(url)
+        if (domain, key) in self._inducing:
+            return
+        self._inducing.add((domain, key))
+        task = asyncio.create_task(self._induce(domain, key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _induce(self, domain: str, key: str):
+        try:
+            samples = await run_blocking(self.samples, domain, key)
+            html, result = samples[0]
+            messages = [
+                {"role": "system", "content": INDUCE_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Extracted values:\n{json.dumps(result, ensure_ascii=False)}\n\n"
+                    f"HTML:\n{await run_blocking(html_excerpt, html, result)}",
+                },
+            ]
+            selectors = parse_json(await complete(messages))
+            valid = isinstance(selectors, dict) and set(result) <= set(selectors)
+            if valid:
+                selectors = {f: selectors[f] if isinstance(selectors[f], dict) else None for f in result}
+                checks = await run_blocking(
+                    lambda: [agrees(expected, apply_selectors(page, selectors)) for page, expected in samples]
+                )
+                valid = all(checks)
+            print(f"Selector template for {domain}: {'active' if valid else 'rejected'}")
+            await run_blocking(self.save, domain, key, selectors if valid else None, valid)
+        except Exception as e:
+            print(f"Selector induction failed for {domain}: {e}")
+        finally:
+            self._inducing.discard((domain, key))
+
+
+templates = TemplateStore() if TEMPLATES_ENABLED else None
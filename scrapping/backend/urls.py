@@ -0,0 +1,49 @@
+# urls.py (small URL helpers shared by the fetch modules)
+import ipaddress
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+try:
+    import tldextract  # full public suffix list, if installed
+    _extract = tldextract.TLDExtract(suffix_list_urls=())  # bundled snapshot, no network
+except ImportError:
+    _extract = None
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# fallback when tldextract is missing: public suffixes that span two labels
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "com.au", "net.au", "org.au", "co.nz", "co.jp",
+    "co.in", "co.za", "co.kr", "com.br", "com.cn", "com.mx", "com.tr", "com.sg", "com.hk",
+}
+
+
+def domain_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def normalize_url(url: str) -> str:
+    # Same page, same key: case-folded scheme/host, no default port,
+    # no fragment, sorted query string
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def registrable_domain(url: str) -> str:
+    """The domain a site owner controls: shop.example.co.uk -> example.co.uk.
+    IP addresses and single-label hosts come back unchanged."""
+    host = domain_of(url)
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    if _extract is not None:
+        parts = _extract(host)
+        return f"{parts.domain}.{parts.suffix}" if parts.domain and parts.suffix else host
+    labels = host.split(".")
+    keep = 3 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return ".".join(labels[-keep:])
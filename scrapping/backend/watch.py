@@ -0,0 +1,150 @@
+# watch.py (change monitoring: fingerprint each page and re-extract only what changed)
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from budget import normalize_whitespace
+from urls import normalize_url
+
+# ─── CONFIG ───────────────────────────────────────────────
+# with WATCH=0, requests asking for watch mode are extracted in full every time
+WATCH_ENABLED = os.getenv("WATCH", "1") == "1"
+WATCH_DB_PATH = os.getenv("WATCH_DB_PATH", "data/watch.sqlite3")
+# beyond either limit the page is re-extracted in full instead of as a diff
+WATCH_MAX_DISTANCE = int(os.getenv("WATCH_MAX_DISTANCE", 24))  # simhash bits out of 64
+WATCH_MAX_CHANGED = float(os.getenv("WATCH_MAX_CHANGED", 0.5))  # share of the page's characters
+
+SHINGLE_WORDS = 3
+_WORDS = re.compile(r"\w+")
+
+
+def simhash(text: str) -> int:
+    """64-bit simhash over word 3-shingles; similar pages differ in few bits."""
+    words = _WORDS.findall(text.lower())
+    shingles = Counter(
+        " ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))
+    )
+    weights = [0] * 64
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def watch_key(url: str, options: dict) -> str:
+    # The stored result only answers the same question about the same page
+    payload = json.dumps({"url": normalize_url(url), **options}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class WatchCheck:
+    key: str
+    status: str  # "new" | "unchanged" | "partial" | "changed"
+    text: str  # normalized page text
+    text_hash: str
+    simhash: int
+    distance: int | None = None
+    previous: object = None  # last stored result
+    added: list[str] = field(default_factory=list)  # sections new since last time
+    removed: list[str] = field(default_factory=list)  # sections gone since last time
+
+    def summary(self) -> dict:
+        return {
+            "status": self.status,
+            "distance": self.distance,
+            "added_sections": len(self.added),
+            "removed_sections": len(self.removed),
+        }
+
+
+class WatchStore:
+    """Last fingerprint, text and result per (URL, prompt) in SQLite."""
+
+    def __init__(self, path=WATCH_DB_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS watches ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, text_hash TEXT NOT NULL, simhash TEXT NOT NULL, "
+            "text BLOB NOT NULL, result TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def check(self, url: str, options: dict, text: str, allow_partial: bool = True) -> WatchCheck:
+        text = normalize_whitespace(text)
+        key = watch_key(url, options)
+        text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        fingerprint = simhash(text)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT text_hash, simhash, text, result FROM watches WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return WatchCheck(key, "new", text, text_hash, fingerprint)
+
+        old_hash, old_simhash, old_text, result = row
+        check = WatchCheck(
+            key, "changed", text, text_hash, fingerprint,
+            distance=distance(fingerprint, int(old_simhash, 16)),
+            previous=json.loads(result),
+        )
+        if old_hash == text_hash:
+            check.status = "unchanged"
+            return check
+        old_sections = zlib.decompress(old_text).decode("utf-8").split("\n")
+        sections = text.split("\n")
+        old_set, new_set = set(old_sections), set(sections)
+        check.added = [s for s in sections if s not in old_set]
+        check.removed = [s for s in old_sections if s not in new_set]
+        changed_chars = sum(map(len, check.added)) + sum(map(len, check.removed))
+        if (
+            allow_partial
+            and check.distance <= WATCH_MAX_DISTANCE
+            and changed_chars <= WATCH_MAX_CHANGED * max(len(text), 1)
+        ):
+            check.status = "partial"
+        return check
+
+    def record(self, url: str, check: WatchCheck, result):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO watches (key, url, text_hash, simhash, text, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    check.key, url, check.text_hash, f"{check.simhash:016x}",
+                    zlib.compress(check.text.encode("utf-8")), json.dumps(result), time.time(),
+                ),
+            )
+
+    def close(self):
+        self.db.close()
+
+
+def diff_prompt(prompt: str, check: WatchCheck) -> str:
+    """Asks for the updated result given the previous one and the changed sections."""
+    removed = "\n".join(check.removed) or "(none)"
+    return (
+        f"{prompt}\n\nThis page was extracted before, with this result:\n"
+        f"{json.dumps(check.previous, ensure_ascii=False)}\n\n"
+        f"Since then these sections were removed:\n{removed}\n\n"
+        "The text below holds only the sections that were added or changed. "
+        "Return the complete updated result in the same format."
+    )
+
+
+watches = WatchStore() if WATCH_ENABLED else None